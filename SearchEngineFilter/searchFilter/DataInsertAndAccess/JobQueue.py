@@ -0,0 +1,97 @@
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from searchFilter.models import ScrapeJob
+
+
+class JobQueue:
+
+    @staticmethod
+    def submit(kind: str, params: dict) -> ScrapeJob:
+        return ScrapeJob.objects.create(kind=kind, params=params, created_time=timezone.now())
+
+    @staticmethod
+    def get(job_id: int) -> Optional[ScrapeJob]:
+        return ScrapeJob.objects.filter(id=job_id).first()
+
+    @staticmethod
+    def lease_seconds() -> int:
+        return getattr(settings, "SCRAPE_JOB_LEASE_SECONDS", 120)
+
+    @staticmethod
+    def claim_next(worker: str) -> Optional[ScrapeJob]:
+        """Move the oldest queued job, or running job whose worker stopped renewing its lease,
+        to running for this worker. The conditional update only succeeds for one worker, so
+        concurrent workers never run the same job. A job whose workers died
+        SCRAPE_JOB_MAX_ATTEMPTS times is failed instead of being handed out again."""
+        now = timezone.now()
+        stale = Q(status=ScrapeJob.STATUS_RUNNING) & (Q(lease_expires__isnull=True) | Q(lease_expires__lt=now))
+        ScrapeJob.objects.filter(stale, attempts__gte=getattr(settings, "SCRAPE_JOB_MAX_ATTEMPTS", 3)).update(
+            status=ScrapeJob.STATUS_FAILED,
+            error="Worker stopped responding on every attempt",
+            lease_expires=None,
+            finished_time=now
+        )
+
+        claimable = Q(status=ScrapeJob.STATUS_QUEUED) | stale
+        while True:
+            job = ScrapeJob.objects.filter(claimable).order_by("id").first()
+            if job is None:
+                return None
+            claimed = ScrapeJob.objects.filter(claimable, id=job.id).update(
+                status=ScrapeJob.STATUS_RUNNING,
+                worker=worker,
+                started_time=now,
+                lease_expires=now + timedelta(seconds=JobQueue.lease_seconds()),
+                attempts=F("attempts") + 1
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+
+    @staticmethod
+    def renew(job: ScrapeJob) -> bool:
+        """Extend the lease of a job this worker is running. False when the job is no longer
+        this worker's, i.e. its lease lapsed and another worker reclaimed it."""
+        return bool(ScrapeJob.objects.filter(id=job.id, worker=job.worker, status=ScrapeJob.STATUS_RUNNING).update(
+            lease_expires=timezone.now() + timedelta(seconds=JobQueue.lease_seconds())
+        ))
+
+    @staticmethod
+    def complete(job: ScrapeJob, result: dict) -> bool:
+        return JobQueue._finish(job, ScrapeJob.STATUS_DONE, result=result)
+
+    @staticmethod
+    def fail(job: ScrapeJob, error: str) -> bool:
+        return JobQueue._finish(job, ScrapeJob.STATUS_FAILED, error=error)
+
+    @staticmethod
+    def _finish(job: ScrapeJob, status: str, **fields) -> bool:
+        """Record the outcome, unless another worker has reclaimed the job meanwhile."""
+        finished_time = timezone.now()
+        finished = ScrapeJob.objects.filter(id=job.id, worker=job.worker, status=ScrapeJob.STATUS_RUNNING).update(
+            status=status, lease_expires=None, finished_time=finished_time, **fields
+        )
+        if finished:
+            job.status, job.lease_expires, job.finished_time = status, None, finished_time
+            for name, value in fields.items():
+                setattr(job, name, value)
+        return bool(finished)
+
+    @staticmethod
+    def to_dict(job: ScrapeJob) -> dict:
+        return {
+            "id": job.id,
+            "kind": job.kind,
+            "params": job.params,
+            "status": job.status,
+            "error": job.error,
+            "worker": job.worker,
+            "attempts": job.attempts,
+            "created_time": job.created_time,
+            "started_time": job.started_time,
+            "finished_time": job.finished_time,
+        }
@@ -1,9 +1,14 @@
-import re
+import logging
 from datetime import datetime
+from typing import Optional
 from django.utils import timezone
-from searchFilter.models import SearchEngine, SearchTermMapping, SearchUrls, UrlData
+from searchFilter.models import SearchEngine, SearchTermMapping, SearchUrls, SerpPage, UrlData
+from searchFilter.DataScraper import KeywordCounter
+from searchFilter.DataScraper.SerpParser import PARSER_VERSION
 from django.db import transaction
 
+logger = logging.getLogger(__name__)
+
 
 class SearchQueryAdd:
 
@@ -16,7 +21,7 @@ class SearchQueryAdd:
         row.save(update_fields=["data_scrape_time"])
 
         search_term = row.searchTermId.searchTerm
-        print(f"getting data for {row.url} - id: {row.id}")
+        logger.debug("getting data for %s - id: %s", row.url, row.id)
         count = SearchQueryAdd.get_count(html=html, keyword=search_term)
 
         url_data_obj, _ = UrlData.objects.get_or_create(
@@ -28,23 +33,22 @@ class SearchQueryAdd:
 
     @staticmethod
     def get_count(html: str, keyword: str):
-        if not html or not keyword:
-            return 0
-            # \b matches word boundaries (start or end of a word)
-        pattern = rf'\b{re.escape(keyword)}\b'
-        return len(re.findall(pattern, html, flags=re.IGNORECASE))
+        """Whole-word, case-insensitive occurrences of keyword in the page's visible text;
+        scripts, styles and attribute values don't count."""
+        return KeywordCounter.count_keyword(html, keyword)
 
     @staticmethod
     @transaction.atomic
-    def add_search_results(search_term: str, data: list[list]):
+    def add_search_results(search_term: str, data: list[list], serp_pages: list = None):
+        """Store every engine's results. serp_pages is [(engine, base_url, [html, ...])]
+        with the pages each engine's results came from, archived under the same run."""
         date = timezone.now()
 
         # Debug: Count how many ads we're finding
         total_ads = 0
         total_results = 0
 
-        print("\n**** PROCESSING SEARCH RESULTS ****")
-        print(f"Search term: {search_term}")
+        logger.debug("Processing search results for search term: %s", search_term)
         obj_added = []
         for curr in data:
             for engine in curr:
@@ -64,7 +68,17 @@ class SearchQueryAdd:
 
                 obj_added.append(search_url_obj)
 
-        print(f"\n**** SEARCH SUMMARY: {total_results} total results, {total_ads} ads/promos ****\n")
+        for engine_name, base_url, pages in serp_pages or ():
+            if pages:
+                search_engine_obj = SearchQueryAdd.add_to_search_engine(engine_name, base_url)
+                search_term_mapping_obj = SearchQueryAdd.add_search_term_mapping(search_term, search_engine_obj, date)
+                SerpPage.objects.bulk_create([
+                    SerpPage(searchTermId=search_term_mapping_obj, page=page, html=SerpPage.compress(html),
+                             parser_version=PARSER_VERSION, fetched_time=date)
+                    for page, html in enumerate(pages)
+                ], ignore_conflicts=True)
+
+        logger.info("Search summary for %s: %d total results, %d ads/promos", search_term, total_results, total_ads)
 
     @staticmethod
     def add_to_search_engine(search_engine: str, base_url: str):
@@ -88,12 +102,8 @@ class SearchQueryAdd:
         # Make sure we're preserving the ad_promo flag from the engine results
         ad_promo = engine.get("ad_promo", False)
 
-        # More detailed debug info
-        search_engine = engine.get("searchEngine", "Unknown")
-        title = engine.get("title", "Unknown")
-        ad_text = "AD/PROMO" if ad_promo else "ORGANIC"
-
-        print(f"[{search_engine}] {ad_text}: {title}")
+        logger.debug("[%s] %s: %s", engine.get("searchEngine", "Unknown"), "AD/PROMO" if ad_promo else "ORGANIC",
+                     engine.get("title", "Unknown"))
 
         try:
             ##TODO: this needs to create new entry
@@ -102,8 +112,48 @@ class SearchQueryAdd:
                 desc=engine["description"],
                 title=engine["title"],
                 ad_promo=engine["ad_promo"],  # Use the flag from the engine results
-                searchTermId=search_term_mapping_obj
+                searchTermId=search_term_mapping_obj,
+                parser_version=PARSER_VERSION
             )
             return search_url_obj
-        except Exception as e:
-            print(e)
\ No newline at end of file
+        except Exception:
+            logger.exception("Failed to store search url %s", engine.get("link"))
+
+    @staticmethod
+    @transaction.atomic
+    def add_reparsed_results(search_term_mapping_id: int, results: list, parser_version: int) -> Optional[int]:
+        """Replace one archived run's rows with those a re-parse produced and mark its pages
+        as parsed at parser_version, in one transaction so an interrupted reparse_serps can
+        simply be run again. Landing pages already scraped for a URL the re-parse still
+        finds move over to its new row; the superseded rows are deleted, so readers only
+        ever see one set of results per run. Returns None, changing nothing, while a
+        worker holds a live lease on one of the run's rows; the run stays pending."""
+        old_rows = SearchUrls.objects.filter(searchTermId_id=search_term_mapping_id,
+                                             parser_version__lt=parser_version)
+        if old_rows.filter(lease_expires__gt=timezone.now(), data_scrape_time__isnull=True).exists():
+            return None
+
+        scraped = {}
+        for row_id, url, scrape_time in (old_rows.filter(data_scrape_time__isnull=False)
+                                         .order_by("id").values_list("id", "url", "data_scrape_time")):
+            scraped.setdefault(url, (row_id, scrape_time))
+
+        SearchUrls.objects.bulk_create([
+            SearchUrls(
+                url=result["link"],
+                desc=result["description"],
+                title=result["title"],
+                ad_promo=result["ad_promo"],
+                data_scrape_time=scraped[result["link"]][1] if result["link"] in scraped else None,
+                searchTermId_id=search_term_mapping_id,
+                parser_version=parser_version
+            ) for result in results
+        ], batch_size=500)
+        new_rows = SearchUrls.objects.filter(searchTermId_id=search_term_mapping_id, parser_version=parser_version,
+                                             url__in=list(scraped))
+        for new_id, url in new_rows.values_list("id", "url"):
+            UrlData.objects.filter(searchUrls_id=scraped[url][0]).update(searchUrls_id=new_id)
+        old_rows.delete()
+
+        SerpPage.objects.filter(searchTermId_id=search_term_mapping_id).update(parser_version=parser_version)
+        return len(results)
@@ -0,0 +1,62 @@
+import re
+from typing import List, NamedTuple, Optional
+
+# "Ad" / "Sponsored" labels next to a result's title, shared by every engine
+AD_TEXT_INDICATORS = ("ad ", "ads ", "sponsored ", "advertisement")
+
+
+class Rule(NamedTuple):
+    """Substrings that mark a result as an ad when found in one of its fields.
+
+    field is whatever the strategy passes to classify(): "url", "text", "html",
+    "classes"... With lowercase the field is lowercased before matching (indicators
+    are matched as written, so one with capitals can only match a field that isn't).
+    """
+    name: str
+    field: str
+    indicators: tuple
+    lowercase: bool = True
+
+
+class AdMatch(NamedTuple):
+    rule: str
+    indicator: str
+
+
+class AdClassifier:
+    """Precompiled ad rules. Rules that read the same field the same way are merged into
+    one regex with a named group per rule, so each field is scanned once however many
+    indicators there are, and the group that matched names the rule that fired."""
+
+    def __init__(self, rules: List[Rule]):
+        grouped = {}
+        for rule in rules:
+            if rule.indicators:
+                grouped.setdefault((rule.field, rule.lowercase), []).append(rule)
+
+        # Scanned in the order their first rule was declared
+        self._scans = []
+        for (field, lowercase), field_rules in grouped.items():
+            group_names = {f"r{i}": rule.name for i, rule in enumerate(field_rules)}
+            pattern = "|".join(
+                f"(?P<r{i}>{'|'.join(re.escape(indicator) for indicator in rule.indicators)})"
+                for i, rule in enumerate(field_rules)
+            )
+            self._scans.append((field, lowercase, re.compile(pattern), group_names))
+
+    def classify(self, **fields: Optional[str]) -> Optional[AdMatch]:
+        """First rule that fires on the given fields, or None for a non-ad. Missing or
+        empty fields are skipped."""
+        lowered = {}
+        for field, lowercase, pattern, group_names in self._scans:
+            value = fields.get(field)
+            if not value:
+                continue
+            if lowercase:
+                if field not in lowered:
+                    lowered[field] = value.lower()
+                value = lowered[field]
+            match = pattern.search(value)
+            if match:
+                return AdMatch(group_names[match.lastgroup], match.group(0))
+        return None
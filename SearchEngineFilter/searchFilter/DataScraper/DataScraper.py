@@ -1,23 +1,55 @@
 import json
-from typing import List
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
 
 from searchFilter.DataInsertAndAccess.SearchQueryAdd import SearchQueryAdd
 from django.http import JsonResponse
-from . import RequestHandler, SearchEngineStrategy, SearchUrl
+from . import DriverPool, Fixtures, ScrapePipeline, SearchEngineStrategy, SearchUrl
 from ..models import SearchUrls, UrlData
 
+logger = logging.getLogger(__name__)
+
 
 class DataScraper:
 
     @staticmethod
     def get_html_from_urls(keyword: str = None):
-        print(f"Getting HTML content for {keyword}")
+        return JsonResponse(DataScraper.collect_html_from_urls(keyword=keyword))
+
+    @staticmethod
+    def collect_html_from_urls(keyword: str = None, worker: str = None) -> dict:
+        """Scrape every unscraped landing page for keyword (or all keywords) and return the
+        response payload. Shared by the get_html_data view and the job worker.
 
-        request_handler = RequestHandler.RequestHandler()
+        Rows are leased in batches, so any number of these can run at once in different
+        processes or machines without scraping the same URL twice."""
+        logger.info("Getting HTML content for %s", keyword)
 
-        results = DataScraper.get_list_of_search_urls(keyword=keyword)
-        return_results = DataScraper.parse_list_of_searches_and_populate_url_data(rows=results,
-                                                                                  request_handler=request_handler)
+        request_handler = Fixtures.build_request_handler()
+        worker = worker or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        batch_size = getattr(settings, "SCRAPE_CLAIM_BATCH", 50)
+
+        return_results = []
+        while True:
+            claim_id, results = DataScraper.claim_search_urls(worker=worker, batch_size=batch_size, keyword=keyword)
+            if not results:
+                break
+            return_results += DataScraper.parse_list_of_searches_and_populate_url_data(rows=results,
+                                                                                       request_handler=request_handler)
+            # Scraped rows are done; failed ones keep their lease and are retried once it lapses
+            DataScraper.release_search_urls(claim_id)
         return_val = [
             {
                 "id": url_data.id,
@@ -31,24 +63,36 @@ class DataScraper:
                 "count": url_data.count_of_appearance
             } for url_data in return_results
         ]
-        return JsonResponse({
+        connection_stats = request_handler.connection_stats()
+        logger.info("HTTP connections: %d for %d requests (reuse ratio %.2f)", connection_stats['connections'],
+                    connection_stats['requests'], connection_stats['reuse_ratio'])
+        return {
             "success": True,
-            "urls": return_val
-        })
+            "urls": return_val,
+            "connection_stats": connection_stats,
+            "proxy_stats": request_handler.proxy_stats()
+        }
 
     @staticmethod
     def parse_list_of_searches_and_populate_url_data(rows: List[SearchUrls], request_handler) -> List[UrlData]:
+        rows_to_scrape = [row for row in rows if not row.ad_promo and not row.data_scrape_time]
+        order = {row.id: index for index, row in enumerate(rows_to_scrape)}
+
         results: List[UrlData] = []
-        for row in rows:
-            if not row.ad_promo and not row.data_scrape_time:
-                try:
-                    html = request_handler.get_with_fallback(row.url)
-                    url_data = DataScraper.add_html_to_table(html=html, row=row)
-                    results.append(url_data)
-                    print(f"Appended - {row.url} - id: {row.id}")
-                except Exception as e:
-                    print(f"Failed processing row ID {row.id}, URL: {row.url}, error: {e}")
-                    continue
+        pipeline = ScrapePipeline.ScrapePipeline(request_handler=request_handler)
+        # Fetches run concurrently, database writes stay on this thread
+        for row, html, error in pipeline.run(rows_to_scrape):
+            if error:
+                logger.warning("Failed processing row ID %s, URL: %s, error: %s", row.id, row.url, error)
+                continue
+            try:
+                url_data = DataScraper.add_html_to_table(html=html, row=row)
+                results.append(url_data)
+                logger.debug("Appended - %s - id: %s", row.url, row.id)
+            except Exception:
+                logger.exception("Failed processing row ID %s, URL: %s", row.id, row.url)
+                continue
+        results.sort(key=lambda url_data: order[url_data.searchUrls.id])
         return results
 
     @staticmethod
@@ -57,7 +101,50 @@ class DataScraper:
         return url_data
 
     @staticmethod
-    def get_list_of_search_urls(keyword: str = None):
+    def claim_search_urls(worker: str, batch_size: int, keyword: str = None) -> tuple:
+        """Lease up to batch_size unscraped, non-ad rows that nobody holds a live lease on.
+        Returns (claim_id, rows). The lease is taken with one conditional UPDATE, so rows
+        another worker grabbed in the meantime are simply not part of this batch."""
+        now = timezone.now()
+        lease_seconds = getattr(settings, "SCRAPE_LEASE_SECONDS", 600)
+        claim_id = f"{worker}:{uuid.uuid4().hex[:8]}"
+
+        while True:
+            candidate_ids = [row.id for row in DataScraper.get_list_of_search_urls(keyword=keyword, claimable_at=now,
+                                                                                    limit=batch_size)]
+            if not candidate_ids:
+                return claim_id, []
+
+            SearchUrls.objects.filter(
+                Q(lease_expires__isnull=True) | Q(lease_expires__lt=now),
+                id__in=candidate_ids,
+                data_scrape_time__isnull=True,
+            ).update(claimed_by=claim_id, lease_expires=now + timedelta(seconds=lease_seconds))
+
+            rows = list(SearchUrls.objects.filter(claimed_by=claim_id).select_related("searchTermId").order_by("id"))
+            logger.info("%s claimed %d of %d candidate urls", worker, len(rows), len(candidate_ids))
+            # Another worker won every candidate; look again rather than report the backlog empty
+            if rows:
+                return claim_id, rows
+
+    @staticmethod
+    def release_search_urls(claim_id: str):
+        SearchUrls.objects.filter(claimed_by=claim_id, data_scrape_time__isnull=False).update(
+            claimed_by=None, lease_expires=None
+        )
+
+    @staticmethod
+    def get_list_of_search_urls(keyword: str = None, claimable_at=None, limit: int = None):
+        # Extra predicates used when claiming: skip ads and rows with a live lease
+        claim_filter = ""
+        claim_params = []
+        if claimable_at is not None:
+            claim_filter = " and ad_promo = %s and (lease_expires is null or lease_expires < %s) order by id"
+            claim_params = [False, connection.ops.adapt_datetimefield_value(claimable_at)]
+            if limit:
+                claim_filter += " limit %s"
+                claim_params.append(limit)
+
         query = ""
         if keyword:
             query = f"""
@@ -70,11 +157,11 @@ class DataScraper:
                             ) b 
                             ON a.searchTerm = b.searchTerm and a.searchEngineName_id =b.searchEngineName_id 
                             and a.time_searched = b.max_time and a.searchTerm = %s
-                )SELECT * from searchFilter_searchurls where searchTermId_id in (select id from ID_TO_SEARCH) and data_scrape_time is null
+                )SELECT * from searchFilter_searchurls where searchTermId_id in (select id from ID_TO_SEARCH) and data_scrape_time is null{claim_filter}
             """
-            latest_entry = SearchUrls.objects.raw(query, [keyword])
+            latest_entry = SearchUrls.objects.raw(query, [keyword] + claim_params)
         else:
-            query = """
+            query = f"""
                     WITH ID_TO_SEARCH AS (
             	        SELECT a.* from searchFilter_searchtermmapping a JOIN 
                             (
@@ -84,20 +171,55 @@ class DataScraper:
                             ) b 
                             ON a.searchTerm = b.searchTerm and a.searchEngineName_id =b.searchEngineName_id 
                             and a.time_searched = b.max_time 
-                    )SELECT * from searchFilter_searchurls where searchTermId_id in (select id from ID_TO_SEARCH) and data_scrape_time is null
+                    )SELECT * from searchFilter_searchurls where searchTermId_id in (select id from ID_TO_SEARCH) and data_scrape_time is null{claim_filter}
                     """
-            latest_entry = SearchUrls.objects.raw(query)
+            latest_entry = SearchUrls.objects.raw(query, claim_params)
         results = []
 
         for row in latest_entry:
             results.append(row)
         return results
 
+    @staticmethod
+    def search_engines_concurrently(list_of_engine_search: List[SearchUrl.SearchUrls], keyword: str,
+                                    url_size: int) -> List[Optional[list]]:
+        """Run every engine's pagination loop on its own worker. Results come back in the
+        same order as list_of_engine_search; an engine that errors or misses the deadline
+        contributes None instead of holding up the others."""
+        timeout = getattr(settings, "SEARCH_ENGINE_TIMEOUT", 180)
+        executor = ThreadPoolExecutor(max_workers=len(list_of_engine_search), thread_name_prefix="engine")
+        try:
+            futures = [executor.submit(curr.search, keyword, url_size) for curr in list_of_engine_search]
+            deadline = time.monotonic() + timeout
+
+            found_urls = []
+            for curr, future in zip(list_of_engine_search, futures):
+                engine_name = curr.strategy.name
+                try:
+                    found_urls.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+                except FutureTimeoutError:
+                    logger.warning("%s did not finish within %ss, skipping its results", engine_name, timeout)
+                    found_urls.append(None)
+                except Exception as e:
+                    logger.warning("%s failed: %s", engine_name, e)
+                    found_urls.append(None)
+            return found_urls
+        finally:
+            # Don't block the response on an engine that overran its deadline
+            executor.shutdown(wait=False, cancel_futures=True)
+
     @staticmethod
     def get_urls(keyword: str, url_size: int):
-        print(f"Getting searches for {keyword} total urls: {url_size}")
+        return JsonResponse(DataScraper.collect_urls(keyword, url_size))
 
-        request_handler = RequestHandler.RequestHandler()
+    @staticmethod
+    def collect_urls(keyword: str, url_size: int) -> dict:
+        """Search every engine for keyword, store the results and return the response
+        payload. Shared by the index view and the job worker."""
+        logger.info("Getting searches for %s total urls: %s", keyword, url_size)
+
+        # Every engine borrows from the same warm browsers rather than launching one per page
+        request_handler = Fixtures.build_request_handler(driver_pool=DriverPool.DriverPool.shared())
 
         google_strategy = SearchEngineStrategy.GoogleSearchStrategy()
         bing_strategy = SearchEngineStrategy.BingSearchStrategy()
@@ -113,32 +235,38 @@ class DataScraper:
 
         try:
             found_urls = list()
+            # Raw pages behind each engine's results, for reparse_serps. A dropped engine's
+            # pages are left out: its run stored no results, so a reparse shouldn't add any
+            serp_pages = []
             ad_promo_count = 0
             total_count = 0
 
-            # Debug info
-            print("\n*** BEGINNING SEARCH FOR ADS/PROMOS ***\n")
-
-            for curr in list_of_engine_search:
-                engine_results = curr.search(keyword, url_size)
+            engine_results_list = DataScraper.search_engines_concurrently(list_of_engine_search, keyword, url_size)
+            for curr, engine_results in zip(list_of_engine_search, engine_results_list):
+                if engine_results is None:
+                    found_urls.append([])
+                    continue
+                serp_pages.append((curr.strategy.name, curr.strategy.spec.base_url, list(curr.pages)))
                 # Count ads/promos
                 for result in engine_results:
                     total_count += 1
                     if result.get("ad_promo", False):
                         ad_promo_count += 1
-                        print(f"Found ad/promo: {result.get('title')} from {result.get('searchEngine')}")
+                        logger.debug("Found ad/promo: %s from %s", result.get('title'), result.get('searchEngine'))
 
                 found_urls.append(engine_results)
 
-            print(f"\n*** FOUND {ad_promo_count} ADS/PROMOS OUT OF {total_count} TOTAL RESULTS ***\n")
+            logger.info("Found %d ads/promos out of %d total results", ad_promo_count, total_count)
 
-            SearchQueryAdd.add_search_results(keyword, found_urls)
-            return JsonResponse({
+            SearchQueryAdd.add_search_results(keyword, found_urls, serp_pages)
+            return {
                 "success": True,
-                "urls": found_urls
-            })
+                "urls": found_urls,
+                # Per engine: pages planned / fetched / served from cache vs results kept
+                "pagination_stats": [curr.stats for curr in list_of_engine_search]
+            }
         except Exception as e:
-            return JsonResponse({
+            return {
                 "success": False,
                 "error": str(e)
-            })
\ No newline at end of file
+            }
\ No newline at end of file
@@ -0,0 +1,208 @@
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from django.conf import settings
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+from . import Resilience
+
+try:
+    import psutil
+except ImportError:  # RSS based recycling is skipped without psutil
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+class PooledDriver:
+
+    def __init__(self, driver: webdriver.Chrome, proxy: str = None):
+        self.driver = driver
+        self.proxy = proxy
+        self.navigations = 0
+        self.created = time.monotonic()
+
+    def rss_mb(self) -> float:
+        """Resident memory of chromedriver plus every browser process it spawned."""
+        if psutil is None:
+            return 0.0
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            processes = [root] + root.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+        except (psutil.Error, AttributeError):
+            return 0.0
+
+
+class DriverPool:
+    """Keeps a bounded set of warm headless Chrome instances that callers borrow
+    for a single navigation instead of launching a new browser per page.
+
+    Chrome takes its proxy at launch, so each browser is tied to the proxy it was started
+    with and borrow(proxy) only hands out a matching one. When the pool is full and none
+    match, an idle browser on another proxy is relaunched."""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, size: int = None, max_navigations: int = None, max_rss_mb: int = None,
+                 acquire_timeout: float = None):
+        self.size = size or getattr(settings, "DRIVER_POOL_SIZE", 4)
+        self.max_navigations = max_navigations or getattr(settings, "DRIVER_MAX_NAVIGATIONS", 50)
+        self.max_rss_mb = max_rss_mb or getattr(settings, "DRIVER_MAX_RSS_MB", 1024)
+        self.acquire_timeout = acquire_timeout or getattr(settings, "DRIVER_ACQUIRE_TIMEOUT", 120)
+
+        self._idle: list[PooledDriver] = []
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._driver_path = None
+        self._driver_path_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "DriverPool":
+        """Process-wide pool so browsers stay warm across requests."""
+        with cls._shared_lock:
+            if cls._shared is None or cls._shared._closed:
+                cls._shared = cls()
+                atexit.register(cls._shared.close)
+            return cls._shared
+
+    @contextmanager
+    def borrow(self, proxy: str = None):
+        pooled = self._acquire(proxy)
+        try:
+            yield pooled.driver
+        finally:
+            pooled.navigations += 1
+            self._release(pooled)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._discard(pooled)
+
+    def _acquire(self, proxy: str = None) -> PooledDriver:
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            pooled = None
+            evicted = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise Resilience.BrowserUnavailable("DriverPool is closed")
+                    matching = [idle for idle in self._idle if idle.proxy == proxy]
+                    if matching:
+                        pooled = matching[-1]
+                        self._idle.remove(pooled)
+                        break
+                    if self._created < self.size:
+                        self._created += 1
+                        break
+                    if self._idle:
+                        # Oldest idle browser is on another proxy; hand its slot to a new launch
+                        evicted = self._idle.pop(0)
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        raise Resilience.BrowserUnavailable(f"No browser available after {self.acquire_timeout}s")
+
+            if evicted is not None:
+                self._quit(evicted)
+
+            if pooled is None:
+                try:
+                    return PooledDriver(self._launch(proxy), proxy)
+                except Exception as e:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    # A crashed or slow Chrome start can succeed on the next attempt
+                    raise Resilience.BrowserUnavailable(f"Chrome failed to start: {e}", retryable=True) from e
+
+            if self._is_healthy(pooled):
+                return pooled
+            logger.warning("Discarding unresponsive browser")
+            self._discard(pooled)
+
+    def _release(self, pooled: PooledDriver):
+        if self._closed or self._needs_recycle(pooled):
+            self._discard(pooled)
+            return
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def _needs_recycle(self, pooled: PooledDriver) -> bool:
+        if pooled.navigations >= self.max_navigations:
+            logger.info("Recycling browser after %d navigations", pooled.navigations)
+            return True
+        rss = pooled.rss_mb()
+        if rss > self.max_rss_mb:
+            logger.info("Recycling browser using %.0f MB", rss)
+            return True
+        return False
+
+    def _is_healthy(self, pooled: PooledDriver) -> bool:
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except WebDriverException:
+            return False
+
+    def _discard(self, pooled: PooledDriver):
+        self._quit(pooled)
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def _quit(self, pooled: PooledDriver):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning("Failed to quit browser: %s", e)
+
+    def _get_driver_path(self) -> str:
+        # ChromeDriverManager hits the network to resolve versions, so only do it once
+        with self._driver_path_lock:
+            if self._driver_path is None:
+                self._driver_path = ChromeDriverManager().install()
+            return self._driver_path
+
+    def _build_options(self, proxy: str = None) -> Options:
+        chrome_options = Options()
+        chrome_options.add_argument("--headless=new")
+        if proxy:
+            parsed = urlparse(proxy)
+            if parsed.username:
+                # --proxy-server has no way to pass credentials; the proxy must allow us by IP
+                logger.warning("Ignoring credentials for browser proxy %s", parsed.hostname)
+            chrome_options.add_argument(f"--proxy-server={parsed.scheme}://{parsed.netloc.rsplit('@', 1)[-1]}")
+
+        chrome_options.add_argument("--disable-gpu")
+        #chrome_options.add_argument("--window-size=1920,1080")
+        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+        # Optionally, add a custom user-agent to reduce detection.
+        chrome_options.add_argument(
+            "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+            "AppleWebKit/537.36 (KHTML, like Gecko) "
+            "Chrome/90.0.4430.93 Safari/537.36")
+        return chrome_options
+
+    def _launch(self, proxy: str = None) -> webdriver.Chrome:
+        service = Service(self._get_driver_path())
+        driver = webdriver.Chrome(service=service, options=self._build_options(proxy))
+        driver.set_page_load_timeout(30)
+        # RequestHandler.get sets per-engine blocked URL patterns, which needs the Network domain
+        driver.execute_cdp_cmd("Network.enable", {})
+        return driver
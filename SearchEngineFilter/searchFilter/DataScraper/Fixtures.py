@@ -0,0 +1,111 @@
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional, Sequence
+from urllib.parse import urlparse, quote
+
+from django.conf import settings
+
+from . import RequestHandler, Resilience
+
+logger = logging.getLogger(__name__)
+
+
+class FixtureStore:
+    """Recorded pages on disk, one file per URL: <directory>/<host>/<sha1 of url>.html"""
+
+    def __init__(self, directory: str = None):
+        self.directory = Path(directory or getattr(settings, "SCRAPER_FIXTURE_DIR"))
+
+    def path_for(self, url: str) -> Path:
+        host = urlparse(url).netloc or "_"
+        return self.directory / host / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.html"
+
+    def load(self, url: str) -> Optional[str]:
+        try:
+            return self.path_for(url).read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def save(self, url: str, html: str):
+        path = self.path_for(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(html, encoding="utf-8")
+
+
+class FixtureRequestHandler(RequestHandler.RequestHandler):
+    """Drop-in RequestHandler that serves recorded SERP and landing pages.
+
+    Pages are read straight from the fixture directory, or, when server_url is set,
+    fetched from a serve_fixtures stub server so the run pays real (simulated) network
+    latency and errors. With record_with set, misses are fetched through that live
+    handler and saved for next time.
+    """
+
+    def __init__(self, fixture_dir: str = None, server_url: str = None,
+                 record_with: RequestHandler.RequestHandler = None, **kwargs):
+        super().__init__(**kwargs)
+        self.store = FixtureStore(fixture_dir)
+        self.server_url = server_url.rstrip("/") if server_url else None
+        self.record_with = record_with
+
+    def get(self, url: str, regions: Sequence[str] = ()) -> str:
+        # Recordings are whole pages; the parser picks the regions out itself
+        html = self._load(url, self.record_with.get if self.record_with else None)
+        if html is None:
+            raise Resilience.FetchError(f"Failed to load {url}: no recorded page", retryable=False)
+        return html
+
+    def get_html_without_js(self, url: str) -> str:
+        try:
+            html = self._load(url, self.record_with.get_html_without_js if self.record_with else None,
+                              transport="http", retry_policy=Resilience.RetryPolicy(max_attempts=1))
+        except Resilience.FetchError as e:
+            logger.warning("%s failed: %s", url, e)
+            return ""
+        return html or ""
+
+    def get_with_fallback(self, url: str):
+        html = self._load(url, self.record_with.get_with_fallback if self.record_with else None, transport="http")
+        if html is None:
+            raise Resilience.FetchError(f"Failed to load {url}: no recorded page", retryable=False)
+        return html
+
+    def _load(self, url: str, live_fetch, transport: str = "browser",
+              retry_policy: Resilience.RetryPolicy = None) -> Optional[str]:
+        if self.server_url:
+            # Same retry and circuit breaker path as live fetches, so injected errors exercise it
+            html = self._with_retry(url, self._fetch_from_server, transport=transport, retry_policy=retry_policy)
+        else:
+            html = self.store.load(url)
+        if html is None and live_fetch:
+            html = live_fetch(url)
+            if html:
+                self.store.save(url, html)
+        return html
+
+    def _fetch_from_server(self, url: str) -> Optional[str]:
+        self.rate_limiter.wait(url)
+        try:
+            response = self.session.get(f"{self.server_url}/fetch?url={quote(url, safe='')}", timeout=30)
+        except Exception as e:
+            raise Resilience.FetchError(f"Stub server request for {url} failed: {e}")
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise Resilience.FetchError(f"Stub server returned {response.status_code} for {url}",
+                                        retryable=response.status_code == 429 or response.status_code >= 500)
+        return response.text
+
+
+def build_request_handler(**kwargs) -> RequestHandler.RequestHandler:
+    """RequestHandler for the scraping entry points: the live one, or a fixture-backed
+    one when SCRAPER_FIXTURE_DIR is configured."""
+    fixture_dir = getattr(settings, "SCRAPER_FIXTURE_DIR", None)
+    if not fixture_dir:
+        return RequestHandler.RequestHandler(**kwargs)
+
+    record_with = RequestHandler.RequestHandler(**kwargs) if getattr(settings, "SCRAPER_FIXTURE_RECORD", False) else None
+    return FixtureRequestHandler(fixture_dir=fixture_dir,
+                                 server_url=getattr(settings, "SCRAPER_FIXTURE_SERVER", None),
+                                 record_with=record_with, **kwargs)
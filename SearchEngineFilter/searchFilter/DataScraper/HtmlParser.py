@@ -0,0 +1,42 @@
+import logging
+import threading
+
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# BeautifulSoup tree builders the strategies can run on. They all expose the same
+# find/select API, so parse_results doesn't change; lxml is several times faster than
+# the pure Python html.parser, html5lib is the slowest but parses like a browser.
+BACKENDS = ("html.parser", "lxml", "html5lib")
+
+FALLBACK_BACKEND = "html.parser"
+
+_available = {}
+_available_lock = threading.Lock()
+
+
+def backend_name(backend: str = None) -> str:
+    """The configured SERP_PARSER_BACKEND, or html.parser if that one isn't installed."""
+    backend = backend or getattr(settings, "SERP_PARSER_BACKEND", FALLBACK_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend '{backend}', expected one of {BACKENDS}")
+    with _available_lock:
+        if backend not in _available:
+            try:
+                BeautifulSoup("", backend)
+                _available[backend] = True
+            except FeatureNotFound:
+                logger.warning("%s is not installed, falling back to %s", backend, FALLBACK_BACKEND)
+                _available[backend] = False
+    return backend if _available[backend] else FALLBACK_BACKEND
+
+
+def make_soup(html: str, backend: str = None, parse_only: SoupStrainer = None) -> BeautifulSoup:
+    """Parse html, keeping only what parse_only matches (and everything under it) when given.
+    html5lib can't build partial trees, so it always parses the whole document."""
+    backend = backend_name(backend)
+    if backend == "html5lib":
+        parse_only = None
+    return BeautifulSoup(html, backend, parse_only=parse_only)
@@ -0,0 +1,178 @@
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util import connection as urllib3_connection
+
+
+class DnsCache:
+    """TTL cache of resolved addresses, bounded to max_entries hosts with the least recently
+    used dropped first. Pooled connections already skip DNS, this covers the new connections
+    opened for every fresh host."""
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> list:
+        """Addresses for host, in getaddrinfo order. Raises socket.gaierror like getaddrinfo."""
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+
+        family = urllib3_connection.allowed_gai_family()
+        addresses = list(dict.fromkeys(
+            sockaddr[0] for *_, sockaddr in socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)))
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addresses)
+            self._entries.move_to_end(key)
+            # Least recently used first: drop past the bound, and expired entries at that end
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or next(iter(self._entries.values()))[0] <= now):
+                self._entries.popitem(last=False)
+        return addresses
+
+
+class _CachedDnsMixin:
+    """Connection that looks its host up in dns_cache, then connects to each address in
+    turn. Only the socket target changes: Host headers, SNI and certificate checks still
+    use the hostname."""
+
+    dns_cache: DnsCache = None
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = self.dns_cache.resolve(host, self.port)
+        except OSError:
+            # Let urllib3 resolve it again and raise its usual NameResolutionError
+            return super()._new_conn()
+        error = None
+        for address in addresses:
+            self._dns_host = address
+            try:
+                return super()._new_conn()
+            except (NewConnectionError, ConnectTimeoutError) as e:
+                error = e
+            finally:
+                self._dns_host = host
+        raise error
+
+
+def _cached_dns_pool_classes(dns_cache: DnsCache) -> dict:
+    http_conn = type("CachedDnsHTTPConnection", (_CachedDnsMixin, HTTPConnection), {"dns_cache": dns_cache})
+    https_conn = type("CachedDnsHTTPSConnection", (_CachedDnsMixin, HTTPSConnection), {"dns_cache": dns_cache})
+    return {
+        "http": type("CachedDnsHTTPConnectionPool", (HTTPConnectionPool,), {"ConnectionCls": http_conn}),
+        "https": type("CachedDnsHTTPSConnectionPool", (HTTPSConnectionPool,), {"ConnectionCls": https_conn}),
+    }
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that remembers how many requests went over how many TCP connections,
+    direct and through proxies, including pools that have already been evicted from their
+    manager. With a dns_cache, its connections (direct and through HTTP proxies) resolve
+    hosts through it."""
+
+    def __init__(self, *args, dns_cache: DnsCache = None, **kwargs):
+        self._pool_classes = _cached_dns_pool_classes(dns_cache) if dns_cache is not None else None
+        self._stats_lock = threading.Lock()
+        self._proxy_managers_lock = threading.Lock()
+        self._retired_requests = 0
+        self._retired_connections = 0
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self._count_retired(self.poolmanager)
+        if self._pool_classes is not None:
+            self.poolmanager.pool_classes_by_scheme = self._pool_classes
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        with self._proxy_managers_lock:
+            new = proxy not in self.proxy_manager
+            manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+            if new:
+                self._count_retired(manager)
+                # SOCKS managers bring their own connection classes and resolve through the proxy
+                if self._pool_classes is not None and not proxy.lower().startswith("socks"):
+                    manager.pool_classes_by_scheme = self._pool_classes
+        return manager
+
+    def _count_retired(self, manager):
+        """Add the counters of every pool manager evicts (or closes) to the retired totals."""
+        dispose = manager.pools.dispose_func
+
+        def _retire(pool):
+            with self._stats_lock:
+                self._retired_requests += pool.num_requests
+                self._retired_connections += pool.num_connections
+            if dispose:
+                dispose(pool)
+
+        manager.pools.dispose_func = _retire
+
+    def connection_stats(self) -> dict:
+        with self._stats_lock:
+            total_requests = self._retired_requests
+            total_connections = self._retired_connections
+        with self._proxy_managers_lock:
+            managers = [self.poolmanager, *self.proxy_manager.values()]
+        for manager in managers:
+            pools = manager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    total_requests += pool.num_requests
+                    total_connections += pool.num_connections
+        return {
+            "requests": total_requests,
+            "connections": total_connections,
+            "reuse_ratio": 1 - total_connections / total_requests if total_requests else 0.0,
+        }
+
+
+def build_session() -> requests.Session:
+    """Keep-alive session shared by a scrape run. pool_connections is how many hosts keep
+    a pool, pool_maxsize how many idle connections each host may keep open."""
+    dns_ttl = getattr(settings, "HTTP_DNS_CACHE_TTL", 300)
+    adapter = CountingHTTPAdapter(
+        pool_connections=getattr(settings, "HTTP_POOL_HOSTS", 100),
+        pool_maxsize=getattr(settings, "HTTP_POOL_PER_HOST", 4),
+        dns_cache=DnsCache(dns_ttl, getattr(settings, "HTTP_DNS_CACHE_SIZE", 1024)) if dns_ttl else None,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def connection_stats(session: requests.Session) -> dict:
+    """Combined reuse figures across every CountingHTTPAdapter mounted on session."""
+    adapters = {id(a): a for a in session.adapters.values() if isinstance(a, CountingHTTPAdapter)}
+    total_requests = 0
+    total_connections = 0
+    for adapter in adapters.values():
+        stats = adapter.connection_stats()
+        total_requests += stats["requests"]
+        total_connections += stats["connections"]
+    return {
+        "requests": total_requests,
+        "connections": total_connections,
+        "reuse_ratio": 1 - total_connections / total_requests if total_requests else 0.0,
+    }
@@ -0,0 +1,59 @@
+import html as html_lib
+import re
+from functools import lru_cache
+from typing import Dict, Sequence
+
+# Markup whose text a reader never sees, then whatever tags are left
+INVISIBLE = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL)
+TAG = re.compile(r"<[^>]+>")
+
+
+def visible_text(html: str) -> str:
+    """The page's readable text: no scripts, styles, comments, tags or attribute values,
+    entities decoded. Tags become spaces so words either side of one stay apart."""
+    return html_lib.unescape(TAG.sub(" ", INVISIBLE.sub(" ", html)))
+
+
+def _keyword_regex(keyword: str) -> str:
+    # Spaces in a keyword match any whitespace, so line breaks and &nbsp; don't hide it
+    return r"\s+".join(re.escape(word) for word in keyword.split())
+
+
+@lru_cache(maxsize=256)
+def _compile(keywords: tuple) -> re.Pattern:
+    # Longest first, so of two keywords starting at the same place the longer one counts.
+    # \b is kept outside the alternation, which re scans several times faster.
+    order = sorted(range(len(keywords)), key=lambda i: -len(keywords[i]))
+    alternatives = "|".join(f"(?P<k{i}>{_keyword_regex(keywords[i])})" for i in order)
+    return re.compile(rf"\b(?:{alternatives})\b", re.IGNORECASE)
+
+
+class KeywordCounter:
+    """Whole-word, case-insensitive occurrence counts of several keywords at once.
+
+    The keywords share one compiled pattern (cached across counters for the same keyword
+    list), so a page's text is scanned once however many there are. Matches don't overlap:
+    where one keyword contains another, the longer match is counted.
+    """
+
+    def __init__(self, keywords: Sequence[str]):
+        self.keywords = tuple(dict.fromkeys(keyword for keyword in keywords if keyword and keyword.strip()))
+        self._pattern = _compile(self.keywords) if self.keywords else None
+
+    def count_text(self, text: str) -> Dict[str, int]:
+        counts = dict.fromkeys(self.keywords, 0)
+        if self._pattern is None or not text:
+            return counts
+        for match in self._pattern.finditer(text):
+            counts[self.keywords[int(match.lastgroup[1:])]] += 1
+        return counts
+
+    def count(self, html: str) -> Dict[str, int]:
+        """Counts in the visible text of an HTML page."""
+        return self.count_text(visible_text(html) if html else "")
+
+
+def count_keyword(html: str, keyword: str) -> int:
+    if not html or not keyword:
+        return 0
+    return KeywordCounter([keyword]).count(html).get(keyword, 0)
@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from django.conf import settings
+
+from . import Resilience
+
+logger = logging.getLogger(__name__)
+
+
+class Proxy:
+    """One egress address with exponentially weighted success rate and latency."""
+
+    def __init__(self, url: str, smoothing: float):
+        self.url = url
+        self.smoothing = smoothing
+        self.success_rate = 1.0
+        self.latency_ms = None
+        self.consecutive_failures = 0
+        self.quarantined_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def score(self) -> float:
+        """Higher is better: success rate discounted by latency (one second halves it)."""
+        latency = self.latency_ms if self.latency_ms is not None else 0.0
+        return self.success_rate / (1.0 + latency / 1000.0)
+
+    def is_quarantined(self, now: float) -> bool:
+        return now < self.quarantined_until
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "score": round(self.score(), 3),
+            "success_rate": round(self.success_rate, 3),
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "quarantined": self.is_quarantined(time.monotonic()),
+        }
+
+
+class ProxyPool:
+    """Rotates fetches over the PROXIES egress addresses.
+
+    Each session key (handler plus target host, see RequestHandler) sticks to the proxy it
+    was first given, so an engine sees one address for a whole pagination run. New keys go
+    to the healthy proxy with the fewest sticky sessions, best score breaking ties. A proxy
+    that fails quarantine_after times in a row is left out for quarantine_seconds and its
+    sessions move elsewhere. An empty pool means direct connections (assign returns None).
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    MAX_STICKY_SESSIONS = 10000
+
+    def __init__(self, proxies: List[str] = None, quarantine_after: int = None, quarantine_seconds: float = None,
+                 smoothing: float = None):
+        proxies = proxies if proxies is not None else getattr(settings, "PROXIES", [])
+        self.quarantine_after = quarantine_after or getattr(settings, "PROXY_QUARANTINE_AFTER", 3)
+        self.quarantine_seconds = quarantine_seconds or getattr(settings, "PROXY_QUARANTINE_SECONDS", 300)
+        smoothing = smoothing or getattr(settings, "PROXY_SCORE_SMOOTHING", 0.2)
+        self.proxies = [Proxy(url, smoothing) for url in proxies]
+        self._sticky: "OrderedDict[str, Proxy]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "ProxyPool":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def from_proxy_dict(cls, proxy: dict) -> "ProxyPool":
+        """Single-proxy pool from a requests style {"http": ..., "https": ...} dict."""
+        url = proxy.get("https") or proxy.get("http")
+        return cls(proxies=[url] if url else [])
+
+    def __len__(self):
+        return len(self.proxies)
+
+    def assign(self, session_key: str) -> Optional[Proxy]:
+        if not self.proxies:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            proxy = self._sticky.get(session_key)
+            if proxy is not None and not proxy.is_quarantined(now):
+                self._sticky.move_to_end(session_key)
+                return proxy
+
+            healthy = [p for p in self.proxies if not p.is_quarantined(now)]
+            if not healthy:
+                raise Resilience.FetchError("Every proxy is quarantined", retryable=False)
+
+            load = {id(p): 0 for p in healthy}
+            for assigned in self._sticky.values():
+                if id(assigned) in load:
+                    load[id(assigned)] += 1
+            proxy = min(healthy, key=lambda p: (load[id(p)], -p.score()))
+
+            self._sticky[session_key] = proxy
+            self._sticky.move_to_end(session_key)
+            while len(self._sticky) > self.MAX_STICKY_SESSIONS:
+                self._sticky.popitem(last=False)
+            return proxy
+
+    def record_success(self, proxy: Optional[Proxy], latency_ms: float):
+        if proxy is None:
+            return
+        with self._lock:
+            proxy.requests += 1
+            proxy.consecutive_failures = 0
+            proxy.success_rate += proxy.smoothing * (1.0 - proxy.success_rate)
+            if proxy.latency_ms is None:
+                proxy.latency_ms = latency_ms
+            else:
+                proxy.latency_ms += proxy.smoothing * (latency_ms - proxy.latency_ms)
+
+    def record_failure(self, proxy: Optional[Proxy], session_key: str = None):
+        """Count a failure against proxy and unstick session_key so its retry can rotate."""
+        if proxy is None:
+            return
+        with self._lock:
+            proxy.requests += 1
+            proxy.failures += 1
+            proxy.consecutive_failures += 1
+            proxy.success_rate -= proxy.smoothing * proxy.success_rate
+            if proxy.consecutive_failures >= self.quarantine_after:
+                logger.warning("Quarantining %s for %ss after %d failures", proxy.url, self.quarantine_seconds,
+                               proxy.consecutive_failures)
+                proxy.quarantined_until = time.monotonic() + self.quarantine_seconds
+                proxy.consecutive_failures = 0
+            if session_key is not None and self._sticky.get(session_key) is proxy:
+                del self._sticky[session_key]
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [proxy.to_dict() for proxy in self.proxies]
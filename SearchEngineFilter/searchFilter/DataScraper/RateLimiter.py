@@ -0,0 +1,76 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds the caller must wait before using it.
+        Tokens may go negative so concurrent callers queue up behind each other."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class HostRateLimiter:
+    """One token bucket per host. Search engines get their own rate/burst from
+    RATE_LIMITS, every other host (landing pages) shares the RATE_LIMIT_DEFAULT budget
+    shape. Callers only sleep when that specific host's bucket is empty.
+
+    Buckets can be scoped, e.g. per proxy: engines limit each egress address separately,
+    so every proxy gets its own budget for the same host."""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, limits: dict = None, default: dict = None, jitter: float = None):
+        self.limits = limits if limits is not None else getattr(settings, "RATE_LIMITS", {})
+        self.default = default or getattr(settings, "RATE_LIMIT_DEFAULT", {"rate": 1.0, "burst": 2})
+        self.jitter = jitter if jitter is not None else getattr(settings, "RATE_LIMIT_JITTER", 0.5)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "HostRateLimiter":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def wait(self, url: str, scope: str = None) -> float:
+        """Block until url's host has budget for one more request; returns seconds slept."""
+        delay = self._bucket(urlparse(url).netloc, scope).reserve()
+        if delay > 0:
+            delay += random.uniform(0, self.jitter)
+            time.sleep(delay)
+        return delay
+
+    def _bucket(self, host: str, scope: str = None) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get((scope, host))
+            if bucket is None:
+                limit = self._limit_for(host)
+                bucket = self._buckets[(scope, host)] = TokenBucket(rate=limit["rate"], burst=limit["burst"])
+            return bucket
+
+    def _limit_for(self, host: str) -> dict:
+        for configured_host, limit in self.limits.items():
+            if host == configured_host or host.endswith("." + configured_host):
+                return limit
+        return self.default
@@ -0,0 +1,130 @@
+import logging
+import re
+import threading
+from typing import Callable, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+from . import RequestHandler, Resilience
+
+logger = logging.getLogger(__name__)
+
+HTTP = "http"
+BROWSER = "browser"
+
+# Phrases served instead of content when a site wants JavaScript or thinks we're a bot
+BLOCKED_MARKERS = re.compile(
+    r"enable javascript|javascript is (?:disabled|required)|turn on javascript|"
+    r"unusual traffic|captcha|are you a robot",
+    re.IGNORECASE,
+)
+SCRIPT_OR_STYLE = re.compile(r"<(script|style|noscript)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+TAG = re.compile(r"<[^>]+>")
+
+
+class RenderModeSelector:
+    """Remembers, per host, whether plain HTTP was enough or a headless browser was needed.
+    Seeded from RENDER_MODES so hosts known to be static skip the discovery fetch."""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, initial: dict = None):
+        self._configured = initial if initial is not None else getattr(settings, "RENDER_MODES", {})
+        self._learned = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "RenderModeSelector":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def mode_for(self, host: str) -> Optional[str]:
+        with self._lock:
+            if host in self._learned:
+                return self._learned[host]
+        for configured_host, mode in self._configured.items():
+            if host == configured_host or host.endswith("." + configured_host):
+                return mode
+        return None
+
+    def remember(self, host: str, mode: str):
+        with self._lock:
+            if self._learned.get(host) != mode:
+                logger.info("Using %s for %s", mode, host)
+            self._learned[host] = mode
+
+
+class AdaptiveFetcher:
+    """Fetch with plain HTTP first and only escalate to RequestHandler.get (headless Chrome)
+    when the cheap response turns out empty, blocked, or JS-only."""
+
+    def __init__(self, request_handler: RequestHandler.RequestHandler, selector: RenderModeSelector = None):
+        self.request_handler = request_handler
+        self.selector = selector or RenderModeSelector.shared()
+
+    @staticmethod
+    def looks_js_only(html: str) -> bool:
+        if not html:
+            return True
+        text = " ".join(TAG.sub(" ", SCRIPT_OR_STYLE.sub(" ", html)).split())
+        min_chars = getattr(settings, "RENDER_MIN_TEXT_CHARS", 200)
+        if len(text) < min_chars:
+            return True
+        # Interstitials are short; a long article that merely mentions captchas is real content
+        return len(text) < min_chars * 10 and bool(BLOCKED_MARKERS.search(text))
+
+    def fetch_serp(self, url: str, parse: Callable[[str], list], regions: Sequence[str] = ()) -> Tuple[str, list]:
+        """Return (html, parse(html)). A page counts as usable when parse finds results.
+        regions are handed to the browser so it only sends back what parse reads."""
+        host = urlparse(url).netloc
+        if self.selector.mode_for(host) != BROWSER:
+            html = self.request_handler.get_html_without_js(url)
+            # JS shells and bot walls parse to nothing, which is all a SERP needs to check
+            results = parse(html) if html else []
+            if results:
+                self.selector.remember(host, HTTP)
+                return html, results
+
+        html = self.request_handler.get(url, regions=regions)
+        results = parse(html)
+        if results:
+            self.selector.remember(host, BROWSER)
+        return html, results
+
+    def fetch_page(self, url: str) -> str:
+        """Landing page fetch: keep the plain HTTP body unless it's a JS shell or bot wall
+        and the browser does better. When the host refuses plain HTTP outright (a 403,
+        throttling that outlasted the retries, its HTTP circuit open) the browser is tried
+        before giving up."""
+        host = urlparse(url).netloc
+        if self.selector.mode_for(host) == BROWSER:
+            return self.request_handler.get(url)
+
+        try:
+            html = self.request_handler.get_with_fallback(url)
+        except Resilience.FetchError as e:
+            # A 404 or a non-HTML page won't render any better
+            if not (e.host_failure or isinstance(e, Resilience.CircuitOpenError)):
+                raise
+            logger.info("Plain HTTP failed for %s, trying the browser: %s", url, e)
+            rendered = self.request_handler.get(url)
+            if not self.looks_js_only(rendered):
+                self.selector.remember(host, BROWSER)
+            return rendered
+        if not self.looks_js_only(html):
+            self.selector.remember(host, HTTP)
+            return html
+
+        try:
+            rendered = self.request_handler.get(url)
+        except Resilience.FetchError as e:
+            logger.warning("Browser fallback for %s failed: %s", url, e)
+            return html
+        if not self.looks_js_only(rendered):
+            self.selector.remember(host, BROWSER)
+            return rendered
+        return html
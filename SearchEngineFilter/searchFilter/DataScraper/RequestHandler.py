@@ -1,62 +1,158 @@
-import requests, time, random
-from selenium import webdriver
+import codecs
+import logging
+import re
+import time
+import uuid
+from collections import deque
+from typing import Sequence
+import requests
 from urllib.parse import urlparse
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from django.conf import settings
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from . import DriverPool, HttpSessions, ProxyPool, RateLimiter, Resilience, ResourceBlocking
+
+logger = logging.getLogger(__name__)
+
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+# Shown instead of results when an engine decides we're a bot
+BLOCK_PAGE_MARKERS = re.compile(r"unusual traffic|captcha|are you a robot|verify you are (?:a )?human",
+                                re.IGNORECASE)
+
+# Bytes the browser pulled over the network for the current document and its subresources.
+# Cross-origin resources without Timing-Allow-Origin report 0, so this is a lower bound.
+TRANSFERRED_BYTES_JS = """
+return performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'))
+    .reduce((total, entry) => total + (entry.transferSize || 0), 0);
+"""
+
+
+# outerHTML of the outermost of the given ids, in document order, or the whole body when
+# none of them is on the page (a block wall, a layout we don't know)
+REGIONS_HTML_JS = """
+const found = arguments[0].map(id => document.getElementById(id)).filter(el => el);
+const outermost = found.filter(el => !found.some(other => other !== el && other.contains(el)));
+if (!outermost.length) {
+    return document.body.innerHTML;
+}
+outermost.sort((a, b) => a.compareDocumentPosition(b) & Node.DOCUMENT_POSITION_FOLLOWING ? -1 : 1);
+return outermost.map(el => el.outerHTML).join("\\n");
+"""
+
+
+class ContentRejected(Resilience.FetchError):
+    """Raised when a page is skipped because its content type isn't HTML. The host
+    answered, so it counts as a success for its circuit."""
+
+    def __init__(self, message: str):
+        super().__init__(message, retryable=False, host_failure=False)
+
 
 class RequestHandler:
 
-    def __init__(self, proxy: dict = None):
-         self.proxy = proxy
+    def __init__(self, proxy: dict = None, driver_pool: DriverPool.DriverPool = None,
+                 rate_limiter: RateLimiter.HostRateLimiter = None, session: requests.Session = None,
+                 block_profiles: dict = None, retry_policy: Resilience.RetryPolicy = None,
+                 circuit_breaker: Resilience.CircuitBreaker = None, proxy_pool: ProxyPool.ProxyPool = None):
+         # A single proxy dict is treated as a one-entry pool; otherwise the PROXIES pool is used
+         if proxy_pool is None:
+             proxy_pool = ProxyPool.ProxyPool.from_proxy_dict(proxy) if proxy else ProxyPool.ProxyPool.shared()
+         self.proxy_pool = proxy_pool
+         # Sticky proxy sessions are per handler and host, so one run keeps its address per engine
+         self.proxy_session = uuid.uuid4().hex
+         self.driver_pool = driver_pool or DriverPool.DriverPool.shared()
+         self.rate_limiter = rate_limiter or RateLimiter.HostRateLimiter.shared()
+         # Shared keep-alive session so repeat hosts reuse their TCP+TLS connections
+         self.session = session or HttpSessions.build_session()
+         self.block_profiles = block_profiles
+         # Most recent browser navigations: {"url", "ms", "bytes", "html_chars", "blocked_patterns"}
+         self.page_stats = deque(maxlen=1000)
+         self.retry_policy = retry_policy or Resilience.RetryPolicy()
+         # Shared so every handler stops hammering a host that is already blocking us
+         self.circuit_breaker = circuit_breaker or Resilience.CircuitBreaker.shared()
 
-    def get(self, url: str) -> str:
-        chrome_options = Options()
-        chrome_options.add_argument("--headless=new")
+    def connection_stats(self) -> dict:
+        return HttpSessions.connection_stats(self.session)
 
-        chrome_options.add_argument("--disable-gpu")
-        #chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        # Optionally, add a custom user-agent to reduce detection.
-        chrome_options.add_argument(
-            "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/90.0.4430.93 Safari/537.36")
+    def proxy_stats(self) -> list:
+        return self.proxy_pool.stats()
 
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        try:
-            driver.set_page_load_timeout(30)
-            driver.get(url)
-            selectors = self._pick_wait_selectors(url)
+    def get(self, url: str, regions: Sequence[str] = ()) -> str:
+        """Render url in headless Chrome and return the body HTML, or only the elements with
+        the given ids when any of them is on the page. Raises FetchError once retries are
+        exhausted, BlockedError for captcha walls and CircuitOpenError while the host's
+        circuit is open."""
+        return self._with_retry(url, lambda url: self._get_once(url, regions))
+
+    def _get_once(self, url: str, regions: Sequence[str] = ()) -> str:
+        return self._through_proxy(url, lambda url, proxy: self._render(url, proxy, regions))
 
+    def _render(self, url: str, proxy: str, regions: Sequence[str] = ()) -> str:
+        self.rate_limiter.wait(url, scope=proxy)
+        with self.driver_pool.borrow(proxy) as driver:
             try:
-                WebDriverWait(driver, 8).until(
-                    EC.any_of(*[
-                        EC.presence_of_element_located((By.CSS_SELECTOR, sel))
-                        for sel in selectors
-                    ])
-                )
+                blocked_patterns = ResourceBlocking.blocked_url_patterns(urlparse(url).netloc, self.block_profiles)
+                # Pooled drivers serve every engine, so the block list is set per navigation
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_patterns})
+                started = time.monotonic()
+                driver.get(url)
+                selectors = self._pick_wait_selectors(url)
+
+                found_selector = True
+                try:
+                    WebDriverWait(driver, 8).until(
+                        EC.any_of(*[
+                            EC.presence_of_element_located((By.CSS_SELECTOR, sel))
+                            for sel in selectors
+                        ])
+                    )
+                except TimeoutException:
+                    found_selector = False
+                if regions:
+                    html = driver.execute_script(REGIONS_HTML_JS, list(regions))
+                else:
+                    html = driver.execute_script("return document.body.innerHTML")
+                # A results page that merely mentions captchas still has its result containers
+                if "/sorry/" in driver.current_url or (not found_selector and BLOCK_PAGE_MARKERS.search(html)):
+                    raise Resilience.BlockedError(f"Blocked by {urlparse(url).netloc} loading {url}")
+                self.page_stats.append({
+                    "url": url,
+                    "ms": (time.monotonic() - started) * 1000,
+                    "bytes": driver.execute_script(TRANSFERRED_BYTES_JS),
+                    "html_chars": len(html),
+                    "blocked_patterns": len(blocked_patterns),
+                })
+                return html
+
             except TimeoutException:
-                pass
-            html = driver.execute_script("return document.body.innerHTML")
-            return html
-
-        except TimeoutException:
-            print(f"[TimeoutException] Failed to load {url}")
-            return "<html><body><p>Timeout</p></body></html>"
-        except WebDriverException as e:
-            print(f"[WebDriverException] Failed to load {url}: {e}")
-            return "<html><body><p>Error</p></body></html>"
-        except Exception as e:
-            print(f"[Exception] General failure loading {url}: {e}")
-            return "<html><body><p>Unknown error</p></body></html>"
-        finally:
-            driver.quit()
+                raise Resilience.FetchError(f"[TimeoutException] Failed to load {url}")
+            except WebDriverException as e:
+                raise Resilience.FetchError(f"[WebDriverException] Failed to load {url}: {e.msg}")
+
+    def _with_retry(self, url: str, fetch, transport: str = "browser", retry_policy: Resilience.RetryPolicy = None):
+        """Run fetch(url) under the retry policy and the circuit of url's host. Plain HTTP
+        fetches have circuits of their own: a host throttling scripted clients can still
+        serve the browser."""
+        key = urlparse(url).netloc if transport == "browser" else f"{urlparse(url).netloc} ({transport})"
+        return (retry_policy or self.retry_policy).call(lambda: fetch(url), breaker=self.circuit_breaker, key=key)
+
+    def _through_proxy(self, url: str, fetch):
+        """Run fetch(url, proxy_url) through this session's proxy for url's host and score the proxy
+        on the outcome. Only failures a different address could avoid count against it."""
+        session_key = f"{self.proxy_session}:{urlparse(url).netloc}"
+        proxy = self.proxy_pool.assign(session_key)
+        started = time.monotonic()
+        try:
+            result = fetch(url, proxy.url if proxy else None)
+        except Resilience.FetchError as e:
+            if e.host_failure:
+                self.proxy_pool.record_failure(proxy, session_key)
+            raise
+        self.proxy_pool.record_success(proxy, (time.monotonic() - started) * 1000)
+        return result
 
     def _pick_wait_selectors(self, url: str):
         netloc = urlparse(url).netloc
@@ -72,25 +168,78 @@ class RequestHandler:
             return ["body"]  # generic fallback
 
     def get_html_without_js(self, url: str) -> str:
+        """One plain HTTP attempt, "" on any failure. Callers treat it as a probe and fall
+        back to get(), so it isn't retried."""
         try:
-            headers = {"User-Agent": "...same UA..."}
-            response = requests.get(url, headers=headers, timeout=60)
-            response.raise_for_status()  # raises for 4xx/5xx
-            return response.text
+            return self._http_get(url, timeout=60, retry_policy=Resilience.RetryPolicy(max_attempts=1))
         except Exception as e:
-            print(f"[requests] {url} failed: {e}")
+            logger.warning("%s failed: %s", url, e)
             return ""
 
     def get_with_fallback(self, url: str):
+        return self._http_get(url, timeout=5)
+
+    def _http_get(self, url: str, timeout: float, retry_policy: Resilience.RetryPolicy = None) -> str:
+        fetch = lambda u, proxy: self._http_get_once(u, proxy, timeout)
+        return self._with_retry(url, lambda u: self._through_proxy(u, fetch), transport="http",
+                                retry_policy=retry_policy)
+
+    def _http_get_once(self, url: str, proxy: str, timeout: float) -> str:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                           "AppleWebKit/537.36 (KHTML, like Gecko) "
                           "Chrome/122.0.0.0 Safari/537.36"
         }
+        self.rate_limiter.wait(url, scope=proxy)
+        proxies = {"http": proxy, "https": proxy} if proxy else None
         try:
-            time.sleep(random.uniform(1.5, 3.5))  # polite delay
-            response = requests.get(url, headers=headers, timeout=5)
-            response.raise_for_status()
-            return response.text
+            with self.session.get(url, headers=headers, timeout=timeout, stream=True, proxies=proxies) as response:
+                response.raise_for_status()  # raises for 4xx/5xx
+                return self._read_html(response, url)
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code
+            if status == 403:
+                # How bot walls answer scripted clients; the browser may still get through
+                raise Resilience.BlockedError(f"Blocked by {urlparse(url).netloc} loading {url}: {e}")
+            # Throttling and server errors can clear up; other 4xx (404, 410...) won't
+            raise Resilience.FetchError(f"Failed to load {url}: {e}", retryable=status == 429 or status >= 500)
         except requests.exceptions.RequestException as e:
-            raise TimeoutError(f"Failed to load {url}: {e}")
\ No newline at end of file
+            raise Resilience.FetchError(f"Failed to load {url}: {e}")
+
+    def _read_html(self, response: requests.Response, url: str) -> str:
+        """Stream the body and decode it incrementally, stopping at MAX_PAGE_BYTES so a
+        single huge page can't blow up memory. Non-HTML responses are rejected before
+        any of the body is downloaded."""
+        content_type = response.headers.get("Content-Type", "")
+        mime_type = content_type.split(";")[0].strip().lower()
+        allowed = getattr(settings, "HTML_CONTENT_TYPES", ("text/html", "application/xhtml+xml"))
+        if mime_type and mime_type not in allowed:
+            raise ContentRejected(f"Skipping {url}: content type {mime_type}")
+
+        max_bytes = getattr(settings, "MAX_PAGE_BYTES", 2 * 1024 * 1024)
+        chunks = response.iter_content(chunk_size=16 * 1024)
+        first_chunk = next(chunks, b"")
+
+        # requests assumes ISO-8859-1 for text/* without a charset, so prefer the page's own <meta>
+        encoding = response.encoding if "charset" in content_type.lower() else None
+        if not encoding:
+            match = META_CHARSET.search(first_chunk[:4096])
+            encoding = match.group(1).decode("ascii") if match else "utf-8"
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        parts = []
+        received = 0
+        chunk = first_chunk
+        while chunk:
+            chunk = chunk[:max_bytes - received]
+            received += len(chunk)
+            parts.append(decoder.decode(chunk))
+            if received >= max_bytes:
+                logger.info("%s truncated at %d bytes", url, max_bytes)
+                break
+            chunk = next(chunks, b"")
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
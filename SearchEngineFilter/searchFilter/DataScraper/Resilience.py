@@ -0,0 +1,136 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FetchError(Exception):
+    """A fetch failed. retryable says whether trying the same URL again could help,
+    host_failure whether the host itself is at fault (down, throttling, blocking us) rather
+    than the URL, as with a 404. It defaults to retryable. reached_host is False when the
+    fetch failed on our side before the host was ever contacted."""
+
+    def __init__(self, message: str, retryable: bool = True, host_failure: bool = None, reached_host: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+        self.host_failure = retryable if host_failure is None else host_failure
+        self.reached_host = reached_host
+
+
+class BlockedError(FetchError):
+    """The site answered with a captcha or bot wall; retrying right away won't help."""
+
+    def __init__(self, message: str):
+        super().__init__(message, retryable=False, host_failure=True)
+
+
+class CircuitOpenError(FetchError):
+    """Raised without touching the network while a host's circuit is open."""
+
+    def __init__(self, message: str):
+        super().__init__(message, retryable=False, host_failure=False, reached_host=False)
+
+
+class BrowserUnavailable(FetchError):
+    """No headless browser could be had: the pool is exhausted or closed, or Chrome failed
+    to start. The host was never contacted, so its circuit doesn't hear about it."""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message, retryable=retryable, host_failure=False, reached_host=False)
+
+
+class CircuitBreaker:
+    """Per-key (host) breaker. After failure_threshold consecutive failed calls the circuit
+    opens and calls fail fast for reset_seconds; then a single trial call is let through and
+    its outcome closes the circuit again or re-opens it. A trial that never reports back
+    (say its thread died) is replaced by another after reset_seconds."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, failure_threshold: int = None, reset_seconds: float = None):
+        self.failure_threshold = failure_threshold or getattr(settings, "CIRCUIT_FAILURE_THRESHOLD", 5)
+        self.reset_seconds = reset_seconds or getattr(settings, "CIRCUIT_RESET_SECONDS", 120)
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "CircuitBreaker":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def state(self, key: str) -> str:
+        with self._lock:
+            return self._circuits.get(key, {}).get("state", self.CLOSED)
+
+    def before_call(self, key: str):
+        with self._lock:
+            circuit = self._circuits.setdefault(key, {"state": self.CLOSED, "failures": 0, "opened_at": 0.0})
+            if circuit["state"] == self.CLOSED:
+                return
+            if time.monotonic() - circuit["opened_at"] >= self.reset_seconds:
+                circuit["state"] = self.HALF_OPEN
+                circuit["opened_at"] = time.monotonic()
+                return
+            raise CircuitOpenError(f"Circuit open for {key}, failing fast")
+
+    def record_success(self, key: str):
+        with self._lock:
+            self._circuits[key] = {"state": self.CLOSED, "failures": 0, "opened_at": 0.0}
+
+    def record_failure(self, key: str):
+        with self._lock:
+            circuit = self._circuits.setdefault(key, {"state": self.CLOSED, "failures": 0, "opened_at": 0.0})
+            circuit["failures"] += 1
+            if circuit["state"] == self.HALF_OPEN or circuit["failures"] >= self.failure_threshold:
+                if circuit["state"] != self.OPEN:
+                    logger.warning("Opening circuit for %s after %d failures", key, circuit['failures'])
+                circuit["state"] = self.OPEN
+                circuit["opened_at"] = time.monotonic()
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for FetchErrors that are marked retryable.
+    The breaker hears about the call once, after its last attempt: a failure when the
+    error is the host's fault, a success when the host answered. Errors raised before the
+    host was contacted leave it alone; a half-open trial that ends that way is replaced
+    after reset_seconds like one that never reports back."""
+
+    def __init__(self, max_attempts: int = None, base_delay: float = None, max_delay: float = None):
+        self.max_attempts = max_attempts or getattr(settings, "FETCH_RETRY_ATTEMPTS", 3)
+        self.base_delay = base_delay or getattr(settings, "FETCH_RETRY_BASE_DELAY", 1.0)
+        self.max_delay = max_delay or getattr(settings, "FETCH_RETRY_MAX_DELAY", 15.0)
+
+    def delay_for(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn: Callable, breaker: CircuitBreaker, key: str):
+        breaker.before_call(key)
+        for attempt in range(self.max_attempts):
+            try:
+                result = fn()
+            except FetchError as e:
+                if e.retryable and attempt < self.max_attempts - 1:
+                    delay = self.delay_for(attempt)
+                    logger.info("%s; attempt %d/%d in %.1fs", e, attempt + 2, self.max_attempts, delay)
+                    time.sleep(delay)
+                    continue
+                if e.host_failure:
+                    breaker.record_failure(key)
+                elif e.reached_host:
+                    # The host answered, the URL was just no good
+                    breaker.record_success(key)
+                raise
+            breaker.record_success(key)
+            return result
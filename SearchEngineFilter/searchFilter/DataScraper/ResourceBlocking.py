@@ -0,0 +1,38 @@
+from typing import List
+
+from django.conf import settings
+
+# URL patterns (Chrome DevTools wildcard syntax) for each blockable category. parse_results
+# only reads markup, so none of these change what a SERP parses to.
+BLOCK_CATEGORIES = {
+    "images": [
+        "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.bmp",
+        "*encrypted-tbn*", "*/th?id=*",
+    ],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*fonts.gstatic.com*"],
+    "media": ["*.mp4", "*.webm", "*.m3u8", "*.mp3", "*.ogg", "*.wav"],
+    "trackers": [
+        "*doubleclick.net*", "*googletagmanager.com*", "*google-analytics.com*",
+        "*googlesyndication.com*", "*bat.bing.com*", "*clarity.ms*", "*scorecardresearch.com*",
+        "*analytics.yahoo.com*", "*facebook.net*", "*hotjar.com*",
+    ],
+}
+
+
+def blocked_url_patterns(host: str, profiles: dict = None) -> List[str]:
+    """Patterns to block while loading a page on host. A profile is a list of category
+    names from BLOCK_CATEGORIES and/or raw URL patterns; hosts match their own entry by
+    exact name or suffix, falling back to "default"."""
+    if profiles is None:
+        profiles = getattr(settings, "BROWSER_BLOCK_PROFILES", {})
+
+    profile = profiles.get("default", [])
+    for configured_host, entries in profiles.items():
+        if configured_host != "default" and (host == configured_host or host.endswith("." + configured_host)):
+            profile = entries
+            break
+
+    patterns = []
+    for entry in profile:
+        patterns.extend(BLOCK_CATEGORIES.get(entry, [entry]))
+    return patterns
@@ -0,0 +1,33 @@
+import json
+import logging
+import random
+
+
+class SampleFilter(logging.Filter):
+    """Passes every record at or above always_level and only a `rate` share of the ones
+    below it, so DEBUG output from the parse path can stay on under load without
+    flooding the handler."""
+
+    def __init__(self, rate: float = 1.0, always_level: str = "INFO"):
+        super().__init__()
+        self.rate = float(rate)
+        self.always_level = always_level if isinstance(always_level, int) else logging.getLevelName(always_level)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.always_level or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for shipping scraper logs to something that indexes fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
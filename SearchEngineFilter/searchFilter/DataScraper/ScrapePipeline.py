@@ -0,0 +1,65 @@
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+from . import RenderMode, RequestHandler
+from ..models import SearchUrls
+
+
+class ScrapePipeline:
+    """Fetches landing pages concurrently. At most max_workers requests are in flight
+    overall and at most per_host of them against any single host, so throughput grows
+    with the number of distinct hosts without piling onto one domain."""
+
+    def __init__(self, request_handler: RequestHandler.RequestHandler, max_workers: int = None,
+                 per_host: int = None):
+        self.request_handler = request_handler
+        self.fetcher = RenderMode.AdaptiveFetcher(request_handler)
+        self.max_workers = max_workers or getattr(settings, "SCRAPE_MAX_WORKERS", 16)
+        self.per_host = per_host or getattr(settings, "SCRAPE_PER_HOST", 2)
+
+    def run(self, rows: List[SearchUrls]) -> Iterator[Tuple[SearchUrls, Optional[str], Optional[Exception]]]:
+        """Yield (row, html, error) as each fetch finishes. Exactly one of html and
+        error is set. Runs the fetches on worker threads but yields on the caller's
+        thread, so the caller can write to the database safely."""
+        pending: "OrderedDict[str, deque]" = OrderedDict()
+        for row in rows:
+            pending.setdefault(urlparse(row.url).netloc, deque()).append(row)
+
+        in_flight_per_host = {}
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scrape") as executor:
+            while pending or in_flight:
+                self._submit_ready(executor, pending, in_flight, in_flight_per_host)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    row, host = in_flight.pop(future)
+                    in_flight_per_host[host] -= 1
+                    try:
+                        yield row, future.result(), None
+                    except Exception as e:
+                        yield row, None, e
+
+    def _submit_ready(self, executor: ThreadPoolExecutor, pending: "OrderedDict[str, deque]", in_flight: dict,
+                      in_flight_per_host: dict):
+        # Round-robin over hosts so one domain with many URLs can't starve the rest
+        while len(in_flight) < self.max_workers:
+            submitted = False
+            for host in list(pending):
+                if len(in_flight) >= self.max_workers:
+                    break
+                if in_flight_per_host.get(host, 0) >= self.per_host:
+                    continue
+                row = pending[host].popleft()
+                if not pending[host]:
+                    del pending[host]
+                in_flight_per_host[host] = in_flight_per_host.get(host, 0) + 1
+                in_flight[executor.submit(self.fetcher.fetch_page, row.url)] = (row, host)
+                submitted = True
+            if not submitted:
+                return
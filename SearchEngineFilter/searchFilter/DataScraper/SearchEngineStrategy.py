@@ -1,22 +1,162 @@
 import urllib.parse
 from abc import ABC, abstractmethod
-from bs4 import BeautifulSoup
 from typing import Optional
 from urllib.parse import urlparse, parse_qs, unquote, urljoin
 
+from . import AdClassifier, SerpParser
+from .AdClassifier import AD_TEXT_INDICATORS, Rule
+from .SerpParser import SELF, TITLE, EngineSpec, Section
+
+GOOGLE_BASE = "https://www.google.com"
+BING_BASE = "https://www.bing.com"
+DUCKDUCKGO_BASE = "https://duckduckgo.com"
+YAHOO_BASE = "https://search.yahoo.com"
+
+
+def _clean_google_href(href: Optional[str]) -> Optional[str]:
+    if not href:
+        return None
+    if href.startswith("/"):
+        href = urljoin(GOOGLE_BASE, href)
+    if href.startswith("/url"):
+        return parse_qs(urlparse(href).query).get("q", [href])[0]
+    return href
+
+
+def _clean_bing_href(href: Optional[str]) -> Optional[str]:
+    if not href:
+        return None
+    if href.startswith("/"):
+        href = urljoin(BING_BASE, href)
+    p = urlparse(href)
+    if p.netloc == "www.bing.com" and p.path == "/aclick":
+        q = parse_qs(p.query)
+        for key in ("u", "r"):
+            if key in q:
+                return unquote(q[key][0])
+    return href
+
+
+def _clean_duckduckgo_href(href: Optional[str]) -> Optional[str]:
+    if not href:
+        return None
+    if href.startswith("/"):
+        href = urljoin(DUCKDUCKGO_BASE, href)
+    if href.startswith("/l/?uddg="):
+        return unquote(href.split("uddg=")[1].split("&")[0])
+    return href
+
+
+def _clean_yahoo_href(href: Optional[str]) -> Optional[str]:
+    if not href:
+        return None
+    if href.startswith("/"):
+        href = urljoin(YAHOO_BASE, href)
+    if "r.search.yahoo.com" in href:
+        parts = href.split("/RU=")
+        if len(parts) > 1:
+            return unquote(parts[1].split("/")[0])
+    return href
+
 
 class SearchEngineStrategy(ABC):
+    name: str = ""
+
+    # Pagination plan: results per page, the query parameter carrying the result offset
+    # (empty if the engine can't paginate), what the first result's offset is, and how
+    # many pages are worth fetching at most
+    page_size: int = 10
+    offset_param: str = ""
+    offset_base: int = 0
+    omit_first_offset: bool = False
+    max_pages: int = 10
 
     @abstractmethod
     def build_search_url(self, keyword: str) -> str:
         pass
 
-    @abstractmethod
+    def page_url(self, keyword: str, page: int) -> str:
+        url = self.build_search_url(keyword)
+        if not self.offset_param or (page == 0 and self.omit_first_offset):
+            return url
+        return f"{url}&{self.offset_param}={page * self.page_size + self.offset_base}"
+
+    def pages_for(self, total_results: int) -> int:
+        """Pages needed to collect total_results if every page were full."""
+        if not self.offset_param:
+            return 1
+        return max(1, min(self.max_pages, -(-total_results // self.page_size)))
+
+    # What the result page looks like, see SerpParser
+    spec: SerpParser.EngineSpec = None
+
+    @property
+    def regions(self) -> tuple:
+        """Ids of the page regions parse_results reads, for fetching only those."""
+        return self.spec.regions
+
     def parse_results(self, html_content: str) -> list:
-        pass
+        """Return organic, ad, and promo results with clean title / link text;
+        also logs each row at DEBUG for quick debugging."""
+        return self.spec.parse(html_content)
+
+
+GOOGLE_ORGANIC = "div.g, div.ULSxyf, div.MjjYud"
+
+
+def _google_organic_ad(item: SerpParser.ParsedItem, page: SerpParser.Page) -> bool:
+    # Check if this div contains any ad indicators
+    return page.spec.classify(html=str(item.node), url=item.link, text=item.title)
+
+
+def _google_ad_description(item: SerpParser.ParsedItem):
+    # Try to find description in parent or next sibling
+    parent = item.node.find_parent()
+    if not parent:
+        return None
+    desc_tag = parent.find("div", class_="VwiC3b")
+    if not desc_tag:
+        next_sib = parent.find_next_sibling()
+        if next_sib:
+            desc_tag = next_sib.find("div", class_="VwiC3b")
+    return desc_tag
+
+
+def _google_promo_title(item: SerpParser.ParsedItem) -> Optional[str]:
+    # Fallback title if no <h3>
+    return item.title if item.title_el is not None else item.node.get_text(" ", strip=True)[:80].strip()
+
+
+def _google_promo_is_organic(item: SerpParser.ParsedItem, page: SerpParser.Page) -> bool:
+    # Skip if this seems like a regular result we've already processed
+    node = item.node
+    return (node.find("h3") is not None and node.find("a", href=True) is not None
+            and node in page.matches(GOOGLE_ORGANIC))
 
 
 class GoogleSearchStrategy(SearchEngineStrategy):
+    name = "Google"
+    offset_param = "start"
+
+    ad_classifier = AdClassifier.AdClassifier([
+        # Shopping units
+        Rule("shopping", "html", ("uEierd", "commercial-unit"), lowercase=False),
+        Rule("url", "url", (
+            'sponsored', 'advertisement', 'ad-', 'ads.', 'adclick',
+            '/aclk', '/ads/', 'doubleclick', 'googleadservices',
+            'shopping'
+        )),
+        Rule("text", "text", AD_TEXT_INDICATORS),
+        # Google-specific ad markup
+        Rule("html", "html", (
+            'adurl=', 'adservingdata', 'adurl?q=',
+            'data-text-ad', 'data-dtld="', 'data-sokoban-container',
+            'kAAxwc', 'uEierd', 'commercial-unit', 'shopping-result',
+            'sponsored-label', 'DtQqvd'
+        )),
+        # Elements containing price tags
+        Rule("price", "html", ("mKZH5e",), lowercase=False),
+    ])
 
     def build_search_url(self, keyword: str) -> str:
         base_url = "https://www.google.com/search"
@@ -26,77 +166,12 @@ class GoogleSearchStrategy(SearchEngineStrategy):
         query = urllib.parse.quote_plus(keyword)
         return f"{base_url}?q={query}"
 
-    def parse_results(self, html_content: str) -> list:
-        """Return organic, ad, and promo results with clean title / link text;
-        also prints each row for quick debugging."""
-        soup = BeautifulSoup(html_content, "html.parser")
-        results = []
-        BASE = "https://www.google.com"
-
-        # Debug: Print counts to help diagnose if selectors are matching
-        print(f"Google search results - HTML length: {len(html_content)}")
-        print(f"Found {len(soup.select('.MjjYud .yuRUbf'))} organic results")
-        #print(f"Found {len(soup.select('div[aria-label=\"Ads\"] a.sVXRqc'))} explicit ad results")
-
-        # Write a sample of the HTML to file for inspection
-        try:
-            with open("google_results.html", "w", encoding="utf-8") as f:
-                f.write(html_content[:10000])  # First 10K of HTML
-            print("Wrote sample of Google HTML to google_results.html")
-        except Exception as e:
-            print(f"Failed to write HTML sample: {e}")
-
-        # Google-specific ad indicators
-        google_ad_indicators = [
-            'adurl=', 'adservingdata', 'adurl?q=',
-            'data-text-ad', 'data-dtld="', 'data-sokoban-container',
-            'kAAxwc', 'uEierd', 'commercial-unit', 'shopping-result',
-            'sponsored-label', 'DtQqvd'
-        ]
-
-        # Add fallback patterns to detect ads
-        ad_indicators = [
-            'sponsored', 'advertisement', 'ad-', 'ads.', 'adclick',
-            '/aclk', '/ads/', 'doubleclick', 'googleadservices',
-            'shopping'
-        ]
-
-        def is_likely_ad(url, text=None, html=None):
-            """Check if a URL, text, or HTML contains common ad indicators"""
-            if url:
-                # Check URL for ad indicators
-                url_lower = url.lower()
-                for indicator in ad_indicators:
-                    if indicator in url_lower:
-                        print(f"Ad detected via URL pattern '{indicator}' in: {url}")
-                        return True
-
-            # Check if there's "Ad" or "Sponsored" text nearby
-            if text and any(x in text.lower() for x in ['ad ', 'ads ', 'sponsored ', 'advertisement']):
-                print(f"Ad detected via text pattern in: {text}")
-                return True
-
-            # Check the HTML for specific Google ad indicators
-            if html:
-                html_lower = html.lower()
-                for indicator in google_ad_indicators:
-                    if indicator in html_lower:
-                        print(f"Ad detected via HTML pattern '{indicator}'")
-                        return True
-
-            return False
-
-        def _clean_href(href: Optional[str]) -> Optional[str]:
-            if not href:
-                return None
-            if href.startswith("/"):
-                href = urljoin(BASE, href)
-            if href.startswith("/url"):
-                return parse_qs(urlparse(href).query).get("q", [href])[0]
-            return href
-
-        # Try multiple selectors for ads
-        ad_selectors = [
+    # Top ads (#tvcap holds #tads), organic results, bottom ads and the knowledge panel
+    spec = EngineSpec(name, GOOGLE_BASE, _clean_google_href, ad_classifier=ad_classifier,
+                      regions=("tvcap", "tads", "rso", "tadsb", "rhs"), sections=[
+        Section("ORG", GOOGLE_ORGANIC, title=["h3"], link=["a[href]"], desc=["div.VwiC3b"],
+                ad_promo=_google_organic_ad),
+        Section("AD", [
             'div[aria-label="Ads"] a.sVXRqc',
             '.commercial-unit-desktop-top',
             '.ads-fr',
@@ -109,141 +184,87 @@ class GoogleSearchStrategy(SearchEngineStrategy):
             'div[data-text-ad="1"]',
             'div[jscontroller="U4Hp0d"]',  # Often shopping ads
             '#tadsb'  # Bottom ads
-        ]
-
-        all_ads = []
-        for selector in ad_selectors:
-            found_ads = soup.select(selector)
-            if found_ads:
-                print(f"Found {len(found_ads)} ads with selector '{selector}'")
-                all_ads.extend(found_ads)
-
-        # Scan all search results
-        all_search_results = soup.select("div.g, div.ULSxyf, div.MjjYud")
-        print(f"Scanning {len(all_search_results)} general results for ad indicators")
-
-        for item in all_search_results:
-            # Check if this is a shopping result (very likely an ad)
-            is_shopping = 'uEierd' in str(item) or 'commercial-unit' in str(item)
-
-            title_tag = item.find("h3")
-            link_tag = item.find("a", href=True)
-            desc_tag = item.find("div", class_="VwiC3b")
-
-            title = title_tag.get_text(strip=True) if title_tag else None
-            link = _clean_href(link_tag["href"]) if link_tag else None
-            desc = desc_tag.get_text(strip=True) if desc_tag else None
-
-            if not title and not link:
-                continue  # Skip items without title or link
-
-            # Check if this div contains any ad indicators
-            is_ad = is_shopping or is_likely_ad(link, title, str(item))
-
-            # Additional check for any ad indicators
-            if not is_ad:
-                if "mKZH5e" in str(item):  # Elements containing price tags
-                    is_ad = True
-                    print(f"Detected price element - likely shopping ad")
-
-            if title and link:
-                if desc is None:
-                    desc = ""  # Use empty string for missing description
-
-                print(f"{'AD' if is_ad else 'ORG'}  title: {title}  --  link: {link}")
-                results.append({
-                    "searchEngine": "Google",
-                    "baseUrl": BASE,
-                    "title": title,
-                    "link": link,
-                    "description": desc,
-                    "ad_promo": is_ad,
-                })
-
-        # Process specific ads from dedicated ad sections
-        for a in all_ads:
-            if a in [r.get("link_tag") for r in results if hasattr(r, "link_tag")]:
-                continue  # Skip if we already processed this link
-
-            title = a.get_text(strip=True)
-            link = _clean_href(a.get("href"))
-
-            # Try to find description in parent or next sibling
-            desc_tag = None
-            parent = a.find_parent()
-            if parent:
-                desc_tag = parent.find("div", class_="VwiC3b")
-                if not desc_tag:
-                    # Look in siblings
-                    next_sib = parent.find_next_sibling()
-                    if next_sib:
-                        desc_tag = next_sib.find("div", class_="VwiC3b")
-
-            desc = desc_tag.get_text(strip=True) if desc_tag else ""
-
-            if title and link:
-                print(f"AD   title: {title}  --  link: {link}")
-                results.append({
-                    "searchEngine": "Google",
-                    "baseUrl": BASE,
-                    "title": title,
-                    "link": link,
-                    "description": desc,
-                    "ad_promo": True,  # This is an ad
-                })
-
-        # ── 3. Promos ──────────────────────────────────────
-        promo_selectors = [
+        ], title=[SELF], link=[SELF], desc=[_google_ad_description]),
+        Section("PROM", [
             ".xpdopen", ".kp-blk", ".VkpGBb", ".FLP8od",
             ".knowledge-panel", ".ifM9O", ".g-blk",
             ".related-question-pair", ".JolIg", ".ULSxyf"
-        ]
-
-        for selector in promo_selectors:
-            for item in soup.select(selector):
-                # Skip if this seems like a regular result we've already processed
-                if item.find("h3") and item.find("a", href=True) and item in all_search_results:
-                    continue
-
-                # Attempt to get standard title and description
-                title_tag = item.find("h3") or item.find("h2")
-                desc_tag = item.find("div", class_="VwiC3b")
-
-                # Try any anchor with a valid link
-                link_tag = item.find("a", href=True)
-                link = _clean_href(link_tag["href"]) if link_tag else None
-
-                # Fallback title if no <h3>
-                title = (
-                    title_tag.get_text(strip=True) if title_tag
-                    else item.get_text(" ", strip=True)[:80].strip()
-                )
-
-                # Fallback desc (skip if totally empty)
-                desc = (
-                    desc_tag.get_text(strip=True) if desc_tag
-                    else None
-                )
-
-                if title and link:
-                    print(f"PROM title: {title}  --  link: {link}")
-                    results.append({
-                        "searchEngine": "Google",
-                        "baseUrl": BASE,
-                        "title": title,
-                        "link": link,
-                        "description": desc or "",
-                        "ad_promo": True,  # This is a promo
-                    })
-
-        # Debug summary
-        ad_count = sum(1 for r in results if r["ad_promo"])
-        print(f"Google results summary: {len(results)} total, {ad_count} ads/promos")
-
-        return results
+        ], title=["h3", "h2"], link=["a[href]"], desc=["div.VwiC3b"], title_fallback=_google_promo_title,
+            skip=_google_promo_is_organic),
+    ])
+
+
+BING_AD_SELECTORS = (
+    '#b_results > li.b_ad',
+    'li.ad',
+    'li[data-tag="ad"]',
+    '.b_adLastChild',
+    '.sb_add',
+    '.ad_sc',
+    'li[data-bm="5"]',  # Sometimes indicates ads
+    '.b_algoPagination + li',  # Ads often appear after pagination
+    '#b_context .b_ad'  # Right-side ads
+)
+
+
+def _bing_anchor(item: SerpParser.ParsedItem):
+    h2 = item.node.find("h2")
+    return h2.find("a", href=True) if h2 else item.node.find("a", href=True)
+
+
+def _bing_heading(item: SerpParser.ParsedItem):
+    h2 = item.node.find("h2")
+    return h2 if h2 and h2.get_text(strip=True) else _bing_anchor(item)
+
+
+def _bing_is_navigation(item: SerpParser.ParsedItem, page: SerpParser.Page) -> bool:
+    return item.title in {"Previous", "Next"} or item.title.startswith("Related searches")
+
+
+def _bing_ad_promo(item: SerpParser.ParsedItem, page: SerpParser.Page) -> bool:
+    # For Bing, we need to be even more careful about different ad structures
+    li = item.node
+    cls = li.get("class", [])
+    cls_str = " ".join(cls).lower()
+
+    # Check if this is a known ad element
+    is_ad = li in page.matches(*BING_AD_SELECTORS)
+    is_promo = any("b_ans" in c for c in cls) or "b_context" in cls_str
+
+    # Look for specific data attributes that indicate ads
+    if li.get("data-bm", "") in ["5", "6"]:  # These values are often used for ads
+        is_ad = True
+
+    # Classes, markup, then URL and title
+    if not is_ad:
+        is_ad = page.spec.classify(classes=cls_str, html=str(li), url=item.link, text=item.title)
+    return is_ad or is_promo
 
 
 class BingSearchStrategy(SearchEngineStrategy):
+    name = "Bing"
+    offset_param = "first"
+    offset_base = 1
+
+    # Specific Bing ad indicators, checked against the item's classes and its markup
+    BING_AD_INDICATORS = (
+        'b_ad', 'ad_sc', 'b_adBottom', 'ad_', 'ads_',
+        'adredir.', 'adticket=', 'bat.bing', 'acb.msn',
+        'sponsored', 'advertisement', 'shopping'
+    )
+
+    ad_classifier = AdClassifier.AdClassifier([
+        Rule("class", "classes", BING_AD_INDICATORS),
+        # Shopping results are often ads
+        Rule("shopping", "html", ("ProductCard", "Products_primaryProductCard"), lowercase=False),
+        Rule("html", "html", BING_AD_INDICATORS),
+        Rule("url", "url", (
+            'sponsored', 'advertisement', 'ad-', 'ads.', 'adclick',
+            '/aclk', '/ads/', 'doubleclick', 'msn.com/ads', 'bing.com/aclick',
+            'bat.bing.com', 'microsoft.com/advertising', 'promoted', 'shopnow'
+        )),
+        Rule("text", "text", AD_TEXT_INDICATORS),
+    ])
 
     def build_search_url(self, keyword: str) -> str:
         base_url = "https://www.bing.com/search"
@@ -253,161 +274,55 @@ class BingSearchStrategy(SearchEngineStrategy):
         query = urllib.parse.quote_plus(keyword)
         return f"{base_url}?q={query}"
 
-    def parse_results(self, html_content: str) -> list:
-        soup = BeautifulSoup(html_content, "html.parser")
-        results = []
-        BASE = "https://www.bing.com"
-
-        # Debug info
-        print(f"Bing search results - HTML length: {len(html_content)}")
-        print(f"Found {len(soup.select('#b_results > li'))} total result items")
-
-        # Write HTML to file for inspection
-        try:
-            with open("bing_results.html", "w", encoding="utf-8") as f:
-                f.write(html_content[:10000])  # First 10K of HTML
-            print("Wrote sample of Bing HTML to bing_results.html")
-        except Exception as e:
-            print(f"Failed to write HTML sample: {e}")
-
-        # Specific Bing ad indicators
-        bing_ad_indicators = [
-            'b_ad', 'ad_sc', 'b_adBottom', 'ad_', 'ads_',
-            'adredir.', 'adticket=', 'bat.bing', 'acb.msn',
-            'sponsored', 'advertisement', 'shopping'
-        ]
-
-        # Common ad patterns in URLs and text
-        ad_indicators = [
-            'sponsored', 'advertisement', 'ad-', 'ads.', 'adclick',
-            '/aclk', '/ads/', 'doubleclick', 'msn.com/ads', 'bing.com/aclick',
-            'bat.bing.com', 'microsoft.com/advertising', 'promoted', 'shopnow'
-        ]
-
-        def is_likely_ad(url, text=None):
-            """Check if a URL or text contains common ad indicators"""
-            if not url:
-                return False
-            # Check URL for ad indicators
-            url_lower = url.lower()
-            for indicator in ad_indicators:
-                if indicator in url_lower:
-                    print(f"Ad detected via URL pattern '{indicator}' in: {url}")
-                    return True
-
-            # Check if there's "Ad" or "Sponsored" text nearby
-            if text and any(x in text.lower() for x in ['ad ', 'ads ', 'sponsored ', 'advertisement']):
-                print(f"Ad detected via text pattern in: {text}")
-                return True
-
-            return False
-
-        def _clean_href(href: Optional[str]) -> Optional[str]:
-            if not href:
-                return None
-            if href.startswith("/"):
-                href = urljoin(BASE, href)
-            p = urlparse(href)
-            if p.netloc == "www.bing.com" and p.path == "/aclick":
-                q = parse_qs(p.query)
-                for key in ("u", "r"):
-                    if key in q:
-                        return unquote(q[key][0])
-            return href
-
-        # Try multiple ad selectors
-        ad_selectors = [
-            '#b_results > li.b_ad',
-            'li.ad',
-            'li[data-tag="ad"]',
-            '.b_adLastChild',
-            '.sb_add',
-            '.ad_sc',
-            'li[data-bm="5"]',  # Sometimes indicates ads
-            '.b_algoPagination + li',  # Ads often appear after pagination
-            '#b_context .b_ad'  # Right-side ads
-        ]
-
-        found_ad_elements = []
-        for selector in ad_selectors:
-            elements = soup.select(selector)
-            if elements:
-                print(f"Found {len(elements)} ad elements with selector '{selector}'")
-                found_ad_elements.extend(elements)
-
-        # Scan all list items in search results
-        all_items = soup.select("#b_results > li, #b_context li")
-        print(f"Scanning {len(all_items)} total items for ads")
-
-        for li in all_items:
-            # For Bing, we need to be even more careful about different ad structures
-            cls = li.get("class", [])
-            cls_str = " ".join(cls).lower()
-
-            # Check if this is a known ad element
-            is_ad = li in found_ad_elements
-
-            # Additional checks for ad classes
-            is_ad = is_ad or any(ad_ind in cls_str for ad_ind in bing_ad_indicators)
-            is_promo = any("b_ans" in c for c in cls) or "b_context" in cls_str
-
-            # Look for specific data attributes that indicate ads
-            data_bm = li.get("data-bm", "")
-            if data_bm in ["5", "6"]:  # These values are often used for ads
-                is_ad = True
-
-            # Look for shopping results which are often ads
-            if "ProductCard" in str(li) or "Products_primaryProductCard" in str(li):
-                is_ad = True
-                print("Found shopping result (likely ad)")
-
-            # Check HTML for ad indicators
-            li_html = str(li).lower()
-            for indicator in bing_ad_indicators:
-                if indicator in li_html:
-                    is_ad = True
-                    print(f"Found Bing ad indicator: {indicator}")
-                    break
-
-            kind = "ad" if is_ad else "promo" if is_promo else "organic"
-
-            # title / link / desc
-            h2 = li.find("h2")
-            a = h2.find("a", href=True) if h2 else li.find("a", href=True)
-            para = li.find("p")
-
-            title = (h2.get_text(strip=True) if h2 and h2.get_text(strip=True)
-                     else a.get_text(strip=True) if a else None)
-            link = _clean_href(a["href"]) if a else None
-            desc = para.get_text(strip=True) if para else None
-
-            # Final URL check for ad indicators
-            if link and not is_ad and not is_promo:
-                is_ad = is_likely_ad(link, title)
-
-            if title:
-                if title in {"Previous", "Next"} or title.startswith("Related searches"):
-                    continue
-                print(f"[{kind.upper()}] title: {title}  --  link: {link}")
-
-                if title and link:  # Make description optional
-                    results.append({
-                        "searchEngine": "Bing",
-                        "baseUrl": BASE,
-                        "title": title,
-                        "link": link,
-                        "description": desc or "",  # Empty string if no description
-                        "ad_promo": is_ad or is_promo,
-                    })
-
-        # Debug summary
-        ad_count = sum(1 for r in results if r["ad_promo"])
-        print(f"Bing results summary: {len(results)} total, {ad_count} ads/promos")
-
-        return results
+    spec = EngineSpec(name, BING_BASE, _clean_bing_href, ad_classifier=ad_classifier, lookups=BING_AD_SELECTORS,
+                      regions=("b_results", "b_context"), sections=[
+        Section("ORG", "#b_results > li, #b_context li", title=[_bing_heading], link=[_bing_anchor], desc=["p"],
+                ad_promo=_bing_ad_promo, skip=_bing_is_navigation),
+    ])
+
+
+def _duckduckgo_result_ad(item: SerpParser.ParsedItem, page: SerpParser.Page) -> bool:
+    # Multiple ways to check if this is an ad: classes, markup, then URL and title
+    result_class_str = " ".join(item.node.get("class", []))
+    return page.spec.classify(classes=result_class_str, html=str(item.node), url=item.link, text=item.title)
+
+
+def _duckduckgo_title_anchor(item: SerpParser.ParsedItem):
+    return item.title_el if item.title_el is not None and item.title_el.name == "a" else None
+
+
+def _duckduckgo_promo_title(item: SerpParser.ParsedItem) -> Optional[str]:
+    # If we have no title but have link and description, use first part of description
+    if not item.title and item.link and item.desc:
+        return item.desc[:60] + ("..." if len(item.desc) > 60 else "")
+    return item.title
 
 
 class DuckDuckGoSearchStrategy(SearchEngineStrategy):
+    name = "DuckDuckGo"
+    # The html endpoint returns about 30 results per page and wants no offset on the first
+    page_size = 30
+    offset_param = "s"
+    omit_first_offset = True
+
+    # DuckDuckGo-specific indicators, checked against the result's classes and its markup
+    DDG_AD_INDICATORS = (
+        'result--ad', 'result__sponsored', 'is-ad',
+        'sponsored', 'js-ad-', 'module--ads',
+        'adserver', 'aaxads', 'module--shopping', 'price'
+    )
+
+    ad_classifier = AdClassifier.AdClassifier([
+        Rule("class", "classes", DDG_AD_INDICATORS),
+        Rule("html", "html", DDG_AD_INDICATORS),
+        Rule("url", "url", (
+            'sponsored', 'advertisement', 'ad-', 'ads.', 'adclick',
+            '/aclk', '/ads/', 'doubleclick', 'googleadservices',
+            'syndication', 'adsystem'
+        )),
+        Rule("text", "text", AD_TEXT_INDICATORS),
+    ])
+
     def build_search_url(self, keyword: str) -> str:
         base_url = "https://duckduckgo.com/html/"
         if isinstance(keyword, bytes):
@@ -415,159 +330,21 @@ class DuckDuckGoSearchStrategy(SearchEngineStrategy):
         query = urllib.parse.quote_plus(keyword)
         return f"{base_url}?q={query}"
 
-    def parse_results(self, html_content: str) -> list:
-        soup = BeautifulSoup(html_content, "html.parser")
-        results = []
-        BASE = "https://duckduckgo.com"
-
-        # Debug info
-        print(f"DuckDuckGo search results - HTML length: {len(html_content)}")
-        print(f"Found {len(soup.select('.result'))} regular results")
-        #print(f"Found {len(soup.select('div[data-testid=\"ad\"]'))} explicit ads")
-
-        # This will help detect if we have the right selectors
-        print(f"Page contains 'result--ad' class: {'result--ad' in html_content}")
-        print(f"Page contains 'sponsored' text: {'sponsored' in html_content.lower()}")
-
-        # Write a sample of HTML for inspection
-        try:
-            with open("ddg_results.html", "w", encoding="utf-8") as f:
-                f.write(html_content[:10000])  # First 10K of HTML
-            print("Wrote sample of DuckDuckGo HTML to ddg_results.html")
-        except Exception as e:
-            print(f"Failed to write HTML sample: {e}")
-
-        # DuckDuckGo-specific indicators
-        ddg_ad_indicators = [
-            'result--ad', 'result__sponsored', 'is-ad',
-            'sponsored', 'js-ad-', 'module--ads',
-            'adserver', 'aaxads', 'module--shopping', 'price'
-        ]
-
-        # Common ad patterns in URLs and text
-        ad_indicators = [
-            'sponsored', 'advertisement', 'ad-', 'ads.', 'adclick',
-            '/aclk', '/ads/', 'doubleclick', 'googleadservices',
-            'syndication', 'adsystem'
-        ]
-
-        def is_likely_ad(url, text=None, html=None):
-            """Check if a URL or text contains common ad indicators"""
-            if url:
-                # Check URL for ad indicators
-                url_lower = url.lower()
-                for indicator in ad_indicators:
-                    if indicator in url_lower:
-                        print(f"Ad detected via URL pattern '{indicator}' in: {url}")
-                        return True
-
-            # Check if there's "Ad" or "Sponsored" text nearby
-            if text and any(x in text.lower() for x in ['ad ', 'ads ', 'sponsored ', 'advertisement']):
-                print(f"Ad detected via text pattern in: {text}")
-                return True
-
-            # Check HTML for DuckDuckGo-specific indicators
-            if html:
-                html_lower = html.lower()
-                for indicator in ddg_ad_indicators:
-                    if indicator in html_lower:
-                        print(f"Ad detected via HTML pattern '{indicator}'")
-                        return True
-
-            return False
-
-        def _clean_href(href: Optional[str]) -> Optional[str]:
-            if not href:
-                return None
-            if href.startswith("/"):
-                href = urljoin(BASE, href)
-            if href.startswith("/l/?uddg="):
-                return unquote(href.split("uddg=")[1].split("&")[0])
-            return href
-
-        # Scan all results
-        for result in soup.select(".result, .web-result"):
-            title_link = result.select_one(".result__a")
-            desc_elem = result.select_one(".result__snippet")
-
-            # Multiple ways to check if this is an ad
-            result_classes = result.get("class", [])
-            result_class_str = " ".join(result_classes).lower()
-
-            is_ad = any(indicator in result_class_str for indicator in ddg_ad_indicators)
-
-            # Check for specific HTML patterns that indicate ads
-            if not is_ad:
-                result_html = str(result).lower()
-                is_ad = is_likely_ad(None, None, result_html)
-
-            title = title_link.get_text(strip=True) if title_link else None
-            link = _clean_href(title_link["href"]) if title_link and title_link.has_attr("href") else None
-            desc = desc_elem.get_text(strip=True) if desc_elem else None
-
-            # Check URL for ad indicators
-            if not is_ad and link:
-                is_ad = is_likely_ad(link, title)
-
-            if title and link:
-                if desc is None:
-                    desc = ""  # Use empty string for missing description
-
-                result_type = "AD" if is_ad else "ORG"
-                print(f"{result_type}  title: {title}  --  link: {link}")
-                results.append({
-                    "searchEngine": "DuckDuckGo",
-                    "baseUrl": BASE,
-                    "title": title,
-                    "link": link,
-                    "description": desc,
-                    "ad_promo": is_ad,
-                })
-
+    spec = EngineSpec(name, DUCKDUCKGO_BASE, _clean_duckduckgo_href, ad_classifier=ad_classifier, sections=[
+        Section("ORG", ".result, .web-result", title=[".result__a"], link=[TITLE], desc=[".result__snippet"],
+                ad_promo=_duckduckgo_result_ad),
         # Additional explicit ads that might use different selectors
-        ad_explicit_selectors = [
+        Section("AD", [
             'div[data-testid="ad"]',
             '.js-ad-link',
             '.js-result-sponsored',
             '.badge--ad',
             '.sponsored',
             '.result--ad'
-        ]
-
-        for selector in ad_explicit_selectors:
-            for item in soup.select(selector):
-                title_tag = None
-                # Different approaches to find title
-                title_tag = item.find("a", attrs={"data-testid": "ad-title"})
-                if not title_tag:
-                    title_tag = item.find("h2") or item.find("h3") or item.find("a", class_="result__a")
-
-                link_tag = title_tag if title_tag and title_tag.name == "a" else item.find("a", href=True)
-
-                # Different approaches to find description
-                desc_tag = item.find("div", class_="ad__desc")
-                if not desc_tag:
-                    desc_tag = item.find("div", class_="result__snippet") or item.find("p")
-
-                title = title_tag.get_text(strip=True) if title_tag else None
-                link = _clean_href(link_tag["href"]) if link_tag else None
-                desc = desc_tag.get_text(strip=True) if desc_tag else None
-
-                if title and link:  # Make description optional
-                    if not desc:
-                        desc = ""  # Use empty string for missing description
-                    print(f"AD   title: {title}  --  link: {link}")
-                    results.append({
-                        "searchEngine": "DuckDuckGo",
-                        "baseUrl": BASE,
-                        "title": title,
-                        "link": link,
-                        "description": desc,
-                        "ad_promo": True,  # This is definitely an ad
-                    })
-
+        ], title=['a[data-testid="ad-title"]', "h2", "h3", "a.result__a"],
+            link=[_duckduckgo_title_anchor, "a[href]"], desc=["div.ad__desc", "div.result__snippet", "p"]),
         # Promotions may be in "modules" or special sections
-        promotion_selectors = [
+        Section("PROM", [
             'div[data-testid="zci"]',
             '.module--carousel',
             '.module--tiles',
@@ -575,237 +352,85 @@ class DuckDuckGoSearchStrategy(SearchEngineStrategy):
             '.module-products',
             '.module--products',
             '.module--shopping'
-        ]
-
-        for selector in promotion_selectors:
-            for item in soup.select(selector):
-                # Try different patterns to extract info
-                title_tag = item.find("h2") or item.find("h3") or item.find(".module__title")
-                link_tag = item.find("a", href=True)
-                desc_tag = item.find("div", class_="zci__content") or item.find("div", class_="module__content")
-
-                title = title_tag.get_text(strip=True) if title_tag else None
-                link = _clean_href(link_tag["href"]) if link_tag else None
-                desc = desc_tag.get_text(strip=True) if desc_tag else None
-
-                # If we have no title but have link and description
-                if not title and link and desc:
-                    # Use first part of description as title
-                    title = desc[:60] + ("..." if len(desc) > 60 else "")
-
-                if title and link:  # Make description optional
-                    if not desc:
-                        desc = ""
-                    print(f"PROM title: {title}  --  link: {link}")
-                    results.append({
-                        "searchEngine": "DuckDuckGo",
-                        "baseUrl": BASE,
-                        "title": title,
-                        "link": link,
-                        "description": desc,
-                        "ad_promo": True,  # This is a promo
-                    })
-
-        # Debug summary
-        ad_count = sum(1 for r in results if r["ad_promo"])
-        print(f"DuckDuckGo results summary: {len(results)} total, {ad_count} ads/promos")
-
-        return results
+        ], title=["h2", "h3"], link=["a[href]"], desc=["div.zci__content", "div.module__content"],
+            title_fallback=_duckduckgo_promo_title),
+    ])
 
 
-class YahooSearchStrategy(SearchEngineStrategy):
+def _yahoo_result_ad_promo(item: SerpParser.ParsedItem, page: SerpParser.Page) -> bool:
+    item_classes = item.node.get("class", [])
+    item_class_str = " ".join(item_classes).lower() if item_classes else ""
+    is_promo = "comp" in item_class_str
 
-    def build_search_url(self, keyword: str) -> str:
-        base_url = "https://search.yahoo.com/search"
-        if isinstance(keyword, bytes):
-            keyword = keyword.decode('utf-8')
-        query = urllib.parse.quote_plus(keyword)
-        return f"{base_url}?p={query}"
+    # Classes, data-beacon, markup, then URL and title
+    is_ad = page.spec.classify(classes=item_class_str, beacon=item.node.get("data-beacon", ""),
+                               html=str(item.node), url=item.link, text=item.title)
+    return is_ad or is_promo
 
-    def parse_results(self, html_content: str) -> list:
-        soup = BeautifulSoup(html_content, "html.parser")
-        results = []
-        BASE = "https://search.yahoo.com"
-
-        # Debug: Print how many elements of each type we find
-        print(f"Yahoo search results - HTML length: {len(html_content)}")
-        print(f"Found {len(soup.select('#web .algo'))} organic results")
-        print(f"Found {len(soup.select('#web .ad'))} explicit ad results")
-        print(f"Found {len(soup.select('#web .compArticleList, #web .compText'))} potential promos")
-
-        # Write a sample of HTML for inspection
-        try:
-            with open("yahoo_results.html", "w", encoding="utf-8") as f:
-                f.write(html_content[:10000])  # First 10K of HTML
-            print("Wrote sample of Yahoo HTML to yahoo_results.html")
-        except Exception as e:
-            print(f"Failed to write HTML sample: {e}")
 
+def _yahoo_already_seen(item: SerpParser.ParsedItem, page: SerpParser.Page) -> bool:
+    # Skip if we've already processed this item
+    text = item.node.get_text(strip=True)[:50]
+    return any(r.get("title") == text for r in page.results)
+
+
+def _yahoo_promo_title(item: SerpParser.ParsedItem) -> Optional[str]:
+    # If no title tag but we have a link, use the link text
+    if not item.title and item.link_el is not None:
+        return item.link_el.get_text(strip=True)
+    return item.title
+
+
+class YahooSearchStrategy(SearchEngineStrategy):
+    name = "Yahoo"
+    offset_param = "first"
+    offset_base = 1
+
+    ad_classifier = AdClassifier.AdClassifier([
+        Rule("class", "classes", ("ad",)),
+        # data-beacon is often used for ads
+        Rule("beacon", "beacon", ("Ad", "ad"), lowercase=False),
         # Yahoo-specific ad indicators
-        yahoo_ad_indicators = [
+        Rule("html", "html", (
             'ad_badge', 'ad-', 'adlink', 'ad-focus', 'adserver',
             'class="ad"', 'class="Ad"', 'shopping-result', 'beacon',
             'compShoppingSummary', 'AdChoices', 'label="Ad"', 'sponsored_'
-        ]
-
-        # Add fallback patterns to detect ads
-        ad_indicators = [
+        )),
+        Rule("url", "url", (
             'sponsored', 'advertisement', 'ad-', 'ads.', 'adclick',
             '/aclk', '/ads/', 'doubleclick', 'googleadservices',
             'shopping', 'yahoo.com/commerce', 'price-section'
-        ]
-
-        def is_likely_ad(url, text=None, html=None):
-            """Check if a URL or text contains common ad indicators"""
-            if url:
-                # Check URL for ad indicators
-                url_lower = url.lower()
-                for indicator in ad_indicators:
-                    if indicator in url_lower:
-                        print(f"Ad detected via URL pattern '{indicator}' in: {url}")
-                        return True
-
-            # Check if there's "Ad" or "Sponsored" text nearby
-            if text and any(x in text.lower() for x in ['ad ', 'ads ', 'sponsored ', 'advertisement']):
-                print(f"Ad detected via text pattern in: {text}")
-                return True
-
-            # Check HTML for Yahoo-specific indicators
-            if html:
-                html_lower = html.lower()
-                for indicator in yahoo_ad_indicators:
-                    if indicator in html_lower:
-                        print(f"Ad detected via HTML pattern '{indicator}'")
-                        return True
-
-            return False
-
-        def _clean_href(href: Optional[str]) -> Optional[str]:
-            if not href:
-                return None
-            if href.startswith("/"):
-                href = urljoin(BASE, href)
-            if "r.search.yahoo.com" in href:
-                parts = href.split("/RU=")
-                if len(parts) > 1:
-                    return unquote(parts[1].split("/")[0])
-            return href
-
-        # Scan all search results for ads - Yahoo has a complex structure
-        all_items = soup.select("#web li, #web .algo, #right .algo, div[data-beacon], .dd.algo, #main li, #right li")
-        print(f"Scanning {len(all_items)} total Yahoo items for ads")
-
-        for item in all_items:
-            # Check if this is an ad by class
-            item_classes = item.get("class", [])
-            item_class_str = " ".join(item_classes).lower() if item_classes else ""
-
-            # Check for ad indicators in the class
-            is_ad = "ad" in item_class_str
-            is_promo = "comp" in item_class_str
-
-            # Check data attributes for beacon (often used for ads)
-            data_beacon = item.get("data-beacon", "")
-            if "Ad" in data_beacon or "ad" in data_beacon:
-                is_ad = True
-                print("Found ad via data-beacon attribute")
-
-            # Check if it contains any ad indicators in the HTML
-            item_html = str(item).lower()
-            if not is_ad:
-                for indicator in yahoo_ad_indicators:
-                    if indicator in item_html:
-                        is_ad = True
-                        print(f"Found Yahoo ad indicator: {indicator}")
-                        break
-
-            title_tag = item.find("h3")
-            link_tag = item.find("a", href=True)
-
-            # Updated selector for description
-            desc_tag = item.find("p",
-                                 class_=lambda c: c and any(cls in c for cls in ["s-desc", "fc-dustygray", "compText"]))
-            if not desc_tag:
-                # Fallback: look for any paragraph in the item
-                desc_tag = item.find("p")
-
-            # Also try the compText div which might contain the description
-            if not desc_tag:
-                comp_text = item.find("div", class_="compText")
-                if comp_text:
-                    desc_tag = comp_text.find("p")
-
-            title = title_tag.get_text(strip=True) if title_tag else None
-            link = _clean_href(link_tag["href"]) if link_tag else None
-            desc = desc_tag.get_text(strip=True) if desc_tag else None
-
-            # Check URL for ad indicators
-            if link and not is_ad:
-                is_ad = is_likely_ad(link, title, item_html)
-
-            # Special case for Yahoo shopping results (which are ads)
-            if not is_ad and "compShoppingSummary" in item_html:
-                is_ad = True
-                print("Detected Yahoo shopping result (likely ad)")
-
-            # Special case for Yahoo product ads
-            if not is_ad and "price-section" in item_html:
-                is_ad = True
-                print("Detected price section (likely product ad)")
-
-            if title and link:  # Make description optional
-                if desc is None:
-                    desc = ""
-
-                result_type = "AD" if is_ad else "PROMO" if is_promo else "ORG"
-                print(f"{result_type}  title: {title}  --  link: {link}")
-
-                results.append({
-                    "searchEngine": "Yahoo",
-                    "baseUrl": BASE,
-                    "title": title,
-                    "link": link,
-                    "description": desc,
-                    "ad_promo": is_ad or is_promo,
-                })
+        )),
+        Rule("text", "text", AD_TEXT_INDICATORS),
+        # Shopping results and product ads
+        Rule("shopping", "html", ("compShoppingSummary", "price-section")),
+    ])
 
+    def build_search_url(self, keyword: str) -> str:
+        base_url = "https://search.yahoo.com/search"
+        if isinstance(keyword, bytes):
+            keyword = keyword.decode('utf-8')
+        query = urllib.parse.quote_plus(keyword)
+        return f"{base_url}?p={query}"
+
+    spec = EngineSpec(name, YAHOO_BASE, _clean_yahoo_href, ad_classifier=ad_classifier,
+                      regions=("web", "right", "main"), sections=[
+        # Yahoo has a complex structure, so every candidate item is scanned for ads
+        Section("ORG", "#web li, #web .algo, #right .algo, div[data-beacon], .dd.algo, #main li, #right li",
+                title=["h3"], link=["a[href]"],
+                desc=['p[class*="s-desc"], p[class*="fc-dustygray"], p[class*="compText"]', "p"],
+                ad_promo=_yahoo_result_ad_promo),
         # Specific ad selectors - might find additional ads
-        ad_selectors = [
+        Section("AD", [
             '#web .ad',
             '#web [data-beacon*="ad"]',
             '.AdBttm',
             '.AdTop',
             '.Ad-Composite',
             '.sw-Card-Bd[data-integration="commerce"]'  # Shopping ads
-        ]
-
-        for selector in ad_selectors:
-            for item in soup.select(selector):
-                # Skip if we've already processed this item
-                if any(r.get("title") == item.get_text(strip=True)[:50] for r in results):
-                    continue
-
-                title_tag = item.find("h3")
-                link_tag = item.find("a", href=True)
-                desc_tag = item.find("p")
-
-                title = title_tag.get_text(strip=True) if title_tag else None
-                link = _clean_href(link_tag["href"]) if link_tag else None
-                desc = desc_tag.get_text(strip=True) if desc_tag else None
-
-                if title and link:
-                    print(f"AD   title: {title}  --  link: {link}")
-                    results.append({
-                        "searchEngine": "Yahoo",
-                        "baseUrl": BASE,
-                        "title": title,
-                        "link": link,
-                        "description": desc or "",
-                        "ad_promo": True,  # This is definitely an ad
-                    })
-
+        ], title=["h3"], link=["a[href]"], desc=["p"], skip=_yahoo_already_seen),
         # Promotions - Yahoo has many types of promotional content
-        promo_selectors = [
+        Section("PROM", [
             "#web .compArticleList",
             "#web .compText",
             "#right .compText",
@@ -814,40 +439,6 @@ class YahooSearchStrategy(SearchEngineStrategy):
             ".compDlink",
             ".compCardList",
             '.sw-Card'  # Shopping widgets
-        ]
-
-        for selector in promo_selectors:
-            for item in soup.select(selector):
-                # Skip if we've already processed this item
-                if any(r.get("title") == item.get_text(strip=True)[:50] for r in results):
-                    continue
-
-                title_tag = item.find("h3") or item.find("h4")
-                link_tag = item.find("a", href=True)
-                desc_tag = item.find("p")
-
-                title = title_tag.get_text(strip=True) if title_tag else None
-
-                # If no title tag but we have a link, use the link text
-                if not title and link_tag:
-                    title = link_tag.get_text(strip=True)
-
-                link = _clean_href(link_tag["href"]) if link_tag else None
-                desc = desc_tag.get_text(strip=True) if desc_tag else None
-
-                if title and link:
-                    print(f"PROM title: {title}  --  link: {link}")
-                    results.append({
-                        "searchEngine": "Yahoo",
-                        "baseUrl": BASE,
-                        "title": title,
-                        "link": link,
-                        "description": desc or "",
-                        "ad_promo": True,  # This is a promotional item
-                    })
-
-        # Debug summary
-        ad_count = sum(1 for r in results if r["ad_promo"])
-        print(f"Yahoo results summary: {len(results)} total, {ad_count} ads/promos")
-
-        return results
\ No newline at end of file
+        ], title=["h3", "h4"], link=["a[href]"], desc=["p"], title_fallback=_yahoo_promo_title,
+            skip=_yahoo_already_seen),
+    ])
@@ -1,73 +1,167 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from functools import total_ordering
-import time
-from . import SearchEngineStrategy, RequestHandler
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from . import SearchEngineStrategy, RequestHandler, RenderMode, Resilience, SerpCache, SerpSnapshots
+
+logger = logging.getLogger(__name__)
+
+
+def merge_page(results: list, seen_links: set, page_results: list) -> int:
+    """Append one page's results to results, dropping ads that repeat a link already seen
+    (or have none). Returns how many new organic links the page added. Shared with
+    reparse_serps so a re-parsed run keeps the same rows a live one would."""
+    new_organic = 0
+    for result in page_results:
+        link = result.get("link")
+        ad_promo = result.get("ad_promo")
+        if (not link or link in seen_links) and ad_promo:
+            continue
+        if link not in seen_links and not ad_promo:
+            new_organic += 1
+
+        seen_links.add(link)
+        results.append(result)
+    return new_organic
 
 
 class SearchUrls:
 
-    def __init__(self, strategy: SearchEngineStrategy, request_handle: RequestHandler):
+    def __init__(self, strategy: SearchEngineStrategy, request_handle: RequestHandler,
+                 cache: SerpCache.SerpCache = None, fetcher: RenderMode.AdaptiveFetcher = None,
+                 prefetch_depth: int = None, snapshots: SerpSnapshots.SnapshotRecorder = None):
         self.strategy = strategy
         self.request_handle = request_handle
+        self.cache = cache or SerpCache.SerpCache()
+        self.fetcher = fetcher or RenderMode.AdaptiveFetcher(request_handle)
+        self.snapshots = snapshots or SerpSnapshots.SnapshotRecorder.shared()
+        self.stats = {}
+        # HTML of the pages the last search used, in order, for the SerpPage archive
+        self.pages = []
+        self._stats_lock = threading.Lock()
+        self.prefetch_depth = max(1, prefetch_depth or getattr(settings, "SERP_PREFETCH_DEPTH", 2))
 
     def search(self, keyword: str, total_results: int) -> list:
         return self.get_search_results(keyword=keyword, total_results=total_results)
 
     def get_search_results(self, keyword: str, total_results: int = 300) -> list:
+        """Page through the engine's results until total_results are collected.
+
+        Pages are planned from the strategy's page size and max_pages, and the plan is
+        re-estimated from how many results each page actually kept, so no page is requested
+        that the budget doesn't need. Up to prefetch_depth planned pages are loaded ahead on
+        worker threads while the current one is parsed; pages are still consumed in order.
+        Pagination also stops on an empty page, or when fewer than SERP_MIN_NEW_RATIO of a
+        page's results are new organic links (the engine is repeating itself or padding with
+        ads). Counters for the run are left in self.stats.
+        """
         results = []
         seen_links = set()
-        start_page = 0
-        starting_size = 0
-
-        while len(results) < 250:
-            search_urls = self.strategy.build_search_url(keyword)
-
-            if isinstance(self.strategy, SearchEngineStrategy.GoogleSearchStrategy):
-                url = f"{search_urls}&start={start_page}"
-            elif isinstance(self.strategy, SearchEngineStrategy.BingSearchStrategy):
-                url = f"{search_urls}&first={start_page + 1}"
-            elif isinstance(self.strategy, SearchEngineStrategy.DuckDuckGoSearchStrategy):
-                url = search_urls if start_page == 0 else f"{search_urls}&s={start_page * 3}"
-            elif isinstance(self.strategy, SearchEngineStrategy.YahooSearchStrategy):
-                url = f"{search_urls}&first={start_page + 1}"
-            else:
-                url = search_urls
-
-            print(f"Fetching: {url}")
-            html = self.request_handle.get(url)
-            page_results = self.strategy.parse_results(html)
-
-            for result in page_results:
-                link = result.get("link")
-                ad_promo = result.get("ad_promo")
-                if (not link or link in seen_links) and ad_promo:
-                    continue
-
-                seen_links.add(link)
-                #
-                # if result.get("ad_promo", False):
-                #     ad_promo_results.append(result)
-                # else:
-                #     organic_results.append(result)
-
-                results.append(result)
-
-            if len(results) >= total_results or starting_size == len(results):
-                break
-
-            print(f"In page - {start_page} - size: {len(results)}")
-            time.sleep(1)
-            start_page += 10
-            starting_size = len(results)
-
-        # final_results = []
-        # ad_count = min(len(ad_promo_results), total_results // 3)
-
-        # if ad_count > 0:
-        #     print(f"Including {ad_count} ads/promos in the final results")
-        #     final_results.extend(ad_promo_results[:ad_count])
-        #
-        # organic_count = total_results - len(final_results)
-        # final_results.extend(organic_results[:organic_count])
-        #
-        # print(f"Final results: {len(final_results)} total, {ad_count} ads/promos")
-        return results
\ No newline at end of file
+        min_new_ratio = getattr(settings, "SERP_MIN_NEW_RATIO", 0.2)
+        max_pages = self.strategy.max_pages if self.strategy.offset_param else 1
+        planned = self.strategy.pages_for(total_results)
+        self.stats = {
+            "engine": self.strategy.name,
+            "pages_planned": planned,
+            "pages_fetched": 0,
+            "pages_cached": 0,
+            "pages_used": 0,
+            "results_seen": 0,
+            "results_kept": 0,
+            "stop_reason": "max_pages",
+        }
+
+        archive = getattr(settings, "SERP_ARCHIVE", True)
+        self.pages = []
+
+        cancelled = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.prefetch_depth, thread_name_prefix=f"serp-{self.strategy.name}")
+        pages = deque()
+        next_page = 0
+        try:
+            while True:
+                while len(pages) < self.prefetch_depth and next_page < planned:
+                    pages.append(executor.submit(self._load_page, keyword, next_page, cancelled))
+                    next_page += 1
+                if not pages:
+                    break
+
+                loaded = pages.popleft().result()
+                if loaded is None:
+                    self.stats["stop_reason"] = "fetch_failed"
+                    break
+                html, page_results = loaded
+                if archive:
+                    self.pages.append(html)
+                page = self.stats["pages_used"]
+                self.stats["pages_used"] += 1
+                self.stats["results_seen"] += len(page_results)
+
+                new_organic = merge_page(results, seen_links, page_results)
+                self.stats["results_kept"] = len(results)
+                logger.debug("In page - %d - size: %d", page, len(results))
+
+                if len(results) >= total_results:
+                    self.stats["stop_reason"] = "budget_met"
+                    break
+                if not page_results:
+                    self.stats["stop_reason"] = "empty_page"
+                    break
+                if page > 0 and new_organic < min_new_ratio * len(page_results):
+                    self.stats["stop_reason"] = "low_yield"
+                    break
+
+                # Re-plan from the observed yield now that pages are rarely full
+                kept_per_page = max(1, len(results) // self.stats["pages_used"])
+                remaining = total_results - len(results)
+                planned = min(max_pages, self.stats["pages_used"] + -(-remaining // kept_per_page))
+                self.stats["pages_planned"] = max(planned, next_page)
+        finally:
+            # Loads that haven't started are dropped; one already on the wire finishes in the background
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        logger.info("%s: kept %d results from %d pages (%d fetched, %d cached), stopped: %s", self.strategy.name,
+                    len(results), self.stats['pages_used'], self.stats['pages_fetched'], self.stats['pages_cached'],
+                    self.stats['stop_reason'])
+        return results
+
+    def _count(self, key: str):
+        # Prefetch workers update these concurrently
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _load_page(self, keyword: str, page: int, cancelled: threading.Event) -> Optional[Tuple[str, list]]:
+        """Fetch (or read from cache) and parse one results page into (html, results). None
+        means pagination should stop here."""
+        if cancelled.is_set():
+            return None
+        url = self.strategy.page_url(keyword, page)
+
+        html = self.cache.get(self.strategy.name, keyword, page)
+        if html is not None:
+            logger.debug("Cached: %s", url)
+            self._count("pages_cached")
+            return html, self.strategy.parse_results(html)
+        if self.cache.replay_only:
+            logger.info("Replay only, no cached page for: %s", url)
+            return None
+
+        logger.debug("Fetching: %s", url)
+        self._count("pages_fetched")
+        try:
+            html, page_results = self.fetcher.fetch_serp(url, self.strategy.parse_results, self.strategy.regions)
+        except Resilience.FetchError as e:
+            # Retries are already spent or the engine's circuit is open; keep what we have
+            logger.warning("Stopping %s pagination: %s", self.strategy.name, e)
+            return None
+        self.snapshots.record(self.strategy.name, keyword, page, html)
+        # Error placeholders and empty pages are not worth replaying
+        if page_results:
+            self.cache.put(self.strategy.name, keyword, page, html)
+        return html, page_results
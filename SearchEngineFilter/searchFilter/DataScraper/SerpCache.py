@@ -0,0 +1,75 @@
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SerpCache:
+    """Raw SERP HTML stored gzip-compressed on disk, keyed by (engine, normalized keyword,
+    page number).
+
+    Modes:
+        off        - never read or write
+        read_write - serve entries younger than ttl seconds, store fresh fetches
+        replay     - serve whatever is on disk regardless of age and never fetch
+    """
+
+    MODES = ("off", "read_write", "replay")
+
+    def __init__(self, directory: str = None, ttl: int = None, mode: str = None):
+        self.directory = Path(directory or getattr(settings, "SERP_CACHE_DIR", "serp_cache"))
+        self.ttl = ttl if ttl is not None else getattr(settings, "SERP_CACHE_TTL", 3600)
+        self.mode = mode or getattr(settings, "SERP_CACHE_MODE", "read_write")
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown SERP cache mode '{self.mode}', expected one of {self.MODES}")
+
+    @property
+    def replay_only(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def normalize_keyword(keyword: str) -> str:
+        if isinstance(keyword, bytes):
+            keyword = keyword.decode('utf-8')
+        return " ".join(keyword.lower().split())
+
+    def path_for(self, engine: str, keyword: str, page: int) -> Path:
+        digest = hashlib.sha1(f"{self.normalize_keyword(keyword)}\n{page}".encode("utf-8")).hexdigest()
+        return self.directory / engine.lower() / f"{digest}.html.gz"
+
+    def get(self, engine: str, keyword: str, page: int) -> Optional[str]:
+        if self.mode == "off":
+            return None
+        path = self.path_for(engine, keyword, page)
+        try:
+            if not self.replay_only and time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return f.read()
+        except (OSError, EOFError):
+            return None
+
+    def put(self, engine: str, keyword: str, page: int, html: str):
+        if self.mode != "read_write":
+            return
+        path = self.path_for(engine, keyword, page)
+        tmp_path = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as f:
+                f.write(html.encode("utf-8"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to store %s: %s", path, e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
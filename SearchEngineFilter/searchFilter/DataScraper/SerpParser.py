@@ -0,0 +1,268 @@
+import logging
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+
+from . import AdClassifier, HtmlParser
+
+logger = logging.getLogger(__name__)
+
+# Stored with every SearchUrls row. Bump it when a spec or ad rule change alters results
+# (benchmark_parsers flags those), then run reparse_serps to re-derive the archived runs.
+PARSER_VERSION = 1
+
+# Attribute and pseudo-class arguments say nothing about which elements a selector can
+# match; they're replaced by a character that can't start a key
+_NESTED = re.compile(r"\[[^\[\]]*\]|\([^()]*\)")
+_COMBINATOR = re.compile(r"\s*[>+~]\s*|\s+")
+_TAG_NAME = re.compile(r"[a-zA-Z][\w-]*")
+_ID = re.compile(r"#([\w-]+)")
+_CLASS = re.compile(r"\.([\w-]+)")
+
+
+def _subject_keys(selector: str) -> Optional[set]:
+    """What an element must have to possibly match selector: for each comma separated part
+    an id, class or tag name taken from its rightmost compound (the element it selects).
+    None when some part has no such key, e.g. a bare [attr], so it's tried everywhere."""
+    if "\\" in selector:
+        return None
+    stripped, previous = selector, None
+    while stripped != previous:
+        previous, stripped = stripped, _NESTED.sub("@", stripped)
+    if any(char in stripped for char in "[]()'\""):
+        return None
+
+    keys = set()
+    for part in stripped.split(","):
+        compounds = [compound for compound in _COMBINATOR.split(part.strip()) if compound]
+        if not compounds:
+            return None
+        subject = compounds[-1]
+        ids, classes, tag = _ID.findall(subject), _CLASS.findall(subject), _TAG_NAME.match(subject)
+        if ids:
+            keys.add(("id", ids[0].lower()))
+        elif classes:
+            keys.add(("class", classes[0].lower()))
+        elif tag:
+            keys.add(("tag", tag.group(0).lower()))
+        else:
+            return None
+    return keys
+
+
+def _element_keys(element: Tag):
+    yield "tag", element.name.lower()
+    element_id = element.get("id")
+    if isinstance(element_id, str):
+        yield "id", element_id.lower()
+    classes = element.get("class") or ()
+    if isinstance(classes, str):
+        classes = classes.split()
+    for cls in classes:
+        yield "class", cls.lower()
+
+
+class SelectorIndex:
+    """Every selector an engine uses, compiled once and matched in a single walk over the
+    page. Selectors are filed under the id, class or tag their subject requires, so each
+    element is only tested against the few that could match it. collect() gives, per
+    selector, the same elements in the same order as soup.select(selector)."""
+
+    def __init__(self, selectors: Sequence[str]):
+        self.selectors = list(dict.fromkeys(selectors))
+        self._compiled = [soupsieve.compile(selector) for selector in self.selectors]
+        self._unindexed = []
+        self._by_key: Dict[tuple, List[int]] = {}
+        for position, selector in enumerate(self.selectors):
+            keys = _subject_keys(selector)
+            if keys is None:
+                self._unindexed.append(position)
+            else:
+                for key in keys:
+                    self._by_key.setdefault(key, []).append(position)
+
+    def collect(self, soup: BeautifulSoup) -> Dict[str, List[Tag]]:
+        found = [[] for _ in self.selectors]
+        for element in soup.descendants:
+            if not isinstance(element, Tag):
+                continue
+            candidates = set(self._unindexed)
+            for key in _element_keys(element):
+                candidates.update(self._by_key.get(key, ()))
+            for position in candidates:
+                if self._compiled[position].match(element):
+                    found[position].append(element)
+        return dict(zip(self.selectors, found))
+
+
+# Field lookups: a CSS selector searched inside the result's element, or a callable
+# taking the ParsedItem (with the fields before it filled in) and returning a Tag
+Lookup = Union[str, Callable[["ParsedItem"], Optional[Tag]]]
+
+
+def SELF(item: "ParsedItem") -> Tag:
+    """The result's element itself, e.g. an ad that is a bare <a>."""
+    return item.node
+
+
+def TITLE(item: "ParsedItem") -> Optional[Tag]:
+    """Whatever element the title came from, for links that live on the title."""
+    return item.title_el
+
+
+def _css_lookup(selector: str) -> Callable[["ParsedItem"], Optional[Tag]]:
+    matcher = soupsieve.compile(selector)
+
+    def lookup(item: "ParsedItem") -> Optional[Tag]:
+        return matcher.select_one(item.node)
+    return lookup
+
+
+class ParsedItem:
+    """Fields pulled out of one result element, as elements and as clean text."""
+
+    def __init__(self, node: Tag):
+        self.node = node
+        self.title_el = self.link_el = self.desc_el = None
+        self.title = self.link = self.desc = None
+
+
+class Section:
+    """One kind of result on an engine's page (organic results, ads, promos...).
+
+    containers are selectors run in order; an element matched by several of them is
+    handled once per selector, like the loops this replaces. title, link and desc are
+    lookups tried in order until one finds an element. The hooks cover engine quirks:
+    title_fallback(item) returns the final title, skip(item, page) drops a result and
+    ad_promo is a flag or a callable(item, page) deciding it per result.
+    """
+
+    def __init__(self, label: str, containers: Union[str, Sequence[str]], title: Sequence[Lookup] = (),
+                 link: Sequence[Lookup] = (), desc: Sequence[Lookup] = (), ad_promo=True,
+                 title_fallback: Callable[[ParsedItem], Optional[str]] = None,
+                 skip: Callable[[ParsedItem, "Page"], bool] = None):
+        self.label = label
+        self.containers = (containers,) if isinstance(containers, str) else tuple(containers)
+        self.title = self._compile(title)
+        self.link = self._compile(link)
+        self.desc = self._compile(desc)
+        self.ad_promo = ad_promo
+        self.title_fallback = title_fallback
+        self.skip = skip
+
+    @staticmethod
+    def _compile(lookups: Sequence[Lookup]) -> list:
+        return [_css_lookup(lookup) if isinstance(lookup, str) else lookup for lookup in lookups]
+
+    @staticmethod
+    def _find(lookups: list, item: ParsedItem) -> Optional[Tag]:
+        for lookup in lookups:
+            found = lookup(item)
+            if found is not None:
+                return found
+        return None
+
+    def extract(self, node: Tag, clean_href: Callable[[Optional[str]], Optional[str]]) -> ParsedItem:
+        item = ParsedItem(node)
+        item.title_el = self._find(self.title, item)
+        item.link_el = self._find(self.link, item)
+        item.desc_el = self._find(self.desc, item)
+        item.title = item.title_el.get_text(strip=True) if item.title_el is not None else None
+        item.link = clean_href(item.link_el.get("href")) if item.link_el is not None else None
+        item.desc = item.desc_el.get_text(strip=True) if item.desc_el is not None else None
+        if self.title_fallback is not None:
+            item.title = self.title_fallback(item)
+        return item
+
+    def parse(self, page: "Page"):
+        spec = page.spec
+        for node in page.matches(*self.containers):
+            item = self.extract(node, spec.clean_href)
+            if not (item.title and item.link):
+                continue
+            if self.skip is not None and self.skip(item, page):
+                continue
+            ad_promo = self.ad_promo(item, page) if callable(self.ad_promo) else self.ad_promo
+            logger.debug("%s %s%s title: %s  --  link: %s", spec.name, self.label, " (ad)" if ad_promo else "",
+                         item.title, item.link)
+            page.results.append({
+                "searchEngine": spec.name,
+                "baseUrl": spec.base_url,
+                "title": item.title,
+                "link": item.link,
+                "description": item.desc or "",
+                "ad_promo": ad_promo,
+            })
+
+
+class Page:
+    """One SERP being parsed: what each selector matched and the results so far."""
+
+    def __init__(self, spec: "EngineSpec", matched: Dict[str, List[Tag]]):
+        self.spec = spec
+        self.results = []
+        self._matched = matched
+
+    def matches(self, *selectors: str) -> List[Tag]:
+        """Elements matched by each selector in turn, duplicates kept."""
+        if len(selectors) == 1:
+            return self._matched[selectors[0]]
+        return [element for selector in selectors for element in self._matched[selector]]
+
+
+class EngineSpec:
+    """An engine's result page described as data: the sections to read, in order, how to
+    turn its hrefs into target URLs, and its ad rules. lookups are extra selectors that
+    hooks read through page.matches() without a section of their own. Every selector is
+    compiled here, once, when the strategy class is defined.
+
+    regions are the ids of the subtrees every section reads from. Only those are parsed
+    (and the browser only sends those back, see RequestHandler.get); a page that has none
+    of them, say after a layout change, is parsed whole. Empty means always parse whole.
+    """
+
+    def __init__(self, name: str, base_url: str, clean_href: Callable[[Optional[str]], Optional[str]],
+                 sections: Sequence[Section], ad_classifier: AdClassifier.AdClassifier = None,
+                 lookups: Sequence[str] = (), regions: Sequence[str] = ()):
+        self.name = name
+        self.base_url = base_url
+        self.clean_href = clean_href
+        self.sections = list(sections)
+        self.ad_classifier = ad_classifier
+        self.lookups = tuple(lookups)
+        self.regions = tuple(regions)
+        self._strainer = SoupStrainer(id=list(self.regions)) if self.regions else None
+        self.index = SelectorIndex([selector for section in self.sections for selector in section.containers]
+                                   + list(self.lookups))
+
+    def classify(self, **fields: Optional[str]) -> bool:
+        """Run the engine's ad rules over fields, logging the rule that fired."""
+        ad_match = self.ad_classifier.classify(**fields) if self.ad_classifier is not None else None
+        if ad_match:
+            logger.debug("Ad detected via %s pattern '%s'", ad_match.rule, ad_match.indicator)
+        return ad_match is not None
+
+    def make_soup(self, html_content: str) -> BeautifulSoup:
+        if self._strainer is not None:
+            soup = HtmlParser.make_soup(html_content, parse_only=self._strainer)
+            if soup.find(True) is not None:
+                return soup
+            logger.debug("%s page has none of %s, parsing all of it", self.name, ", ".join(self.regions))
+        return HtmlParser.make_soup(html_content)
+
+    def parse(self, html_content: str) -> list:
+        soup = self.make_soup(html_content)
+        page = Page(self, self.index.collect(soup))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s search results - HTML length: %d", self.name, len(html_content))
+            for selector in self.index.selectors:
+                logger.debug("Found %d elements with selector '%s'", len(page.matches(selector)), selector)
+
+        for section in self.sections:
+            section.parse(page)
+
+        logger.debug("%s results summary: %d total, %d ads/promos", self.name, len(page.results),
+                     sum(1 for result in page.results if result["ad_promo"]))
+        return page.results
@@ -0,0 +1,97 @@
+import atexit
+import itertools
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+UNSAFE_FILENAME_CHARS = re.compile(r"[^\w-]+")
+
+
+class SnapshotRecorder:
+    """Opt-in copy of every fetched SERP page for debugging selectors, written as
+    <SERP_SNAPSHOT_DIR>/<run>/<engine>/<seq>-<keyword>-p<page>.html where run is one
+    process's start time and pid, so concurrent runs never clobber each other.
+
+    Pages are handed to a background writer thread through a bounded queue; when the disk
+    can't keep up, snapshots are dropped rather than slowing the scrape. With
+    SERP_SNAPSHOT_DIR unset (the default) record() returns immediately and nothing is started.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, directory: str = None, max_pending: int = None):
+        directory = directory if directory is not None else getattr(settings, "SERP_SNAPSHOT_DIR", None)
+        run = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.directory = Path(directory) / run if directory else None
+        self.max_pending = max_pending or getattr(settings, "SERP_SNAPSHOT_MAX_PENDING", 100)
+        self.dropped = 0
+        self._sequence = itertools.count(1)
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "SnapshotRecorder":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+                atexit.register(cls._shared.close)
+            return cls._shared
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def record(self, engine: str, keyword: str, page: int, html: str):
+        if not self.enabled:
+            return
+        self._start()
+        try:
+            self._queue.put_nowait((next(self._sequence), engine, keyword, page, html))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning("Snapshot writer is behind, %d snapshots dropped so far", self.dropped)
+
+    def close(self, timeout: float = 10):
+        """Flush pending snapshots and stop the writer."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            thread, self._thread = self._thread, None
+        thread.join(timeout)
+
+    def path_for(self, sequence: int, engine: str, keyword: str, page: int) -> Path:
+        slug = UNSAFE_FILENAME_CHARS.sub("_", keyword).strip("_")[:60] or "_"
+        return self.directory / engine.lower() / f"{sequence:05d}-{slug}-p{page}.html"
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._queue = queue.Queue(maxsize=self.max_pending)
+                self._thread = threading.Thread(target=self._write_loop, args=(self._queue,),
+                                                name="serp-snapshots", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self, pending: queue.Queue):
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            sequence, engine, keyword, page, html = item
+            path = self.path_for(sequence, engine, keyword, page)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(html, encoding="utf-8")
+            except OSError as e:
+                logger.warning("Failed to write snapshot %s: %s", path, e)
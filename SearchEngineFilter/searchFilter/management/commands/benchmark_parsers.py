@@ -0,0 +1,158 @@
+import gzip
+import json
+import math
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from searchFilter.DataScraper import HtmlParser, SearchEngineStrategy
+
+STRATEGIES = [
+    SearchEngineStrategy.GoogleSearchStrategy(),
+    SearchEngineStrategy.BingSearchStrategy(),
+    SearchEngineStrategy.DuckDuckGoSearchStrategy(),
+    SearchEngineStrategy.YahooSearchStrategy(),
+]
+
+# Checked-in SERP pages, one directory per engine, each page next to its golden <page>.json
+CORPUS_DIR = Path(__file__).resolve().parents[2] / "serp_corpus"
+
+
+def _percentile(samples: list, q: float) -> float:
+    """Nearest-rank percentile, q in 0..1."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = ("Parse stored SERP pages with every HTML parser backend and report, per engine, pages/second, "
+            "p50/p99 parse latency and peak memory. Results must match the golden <page>.json next to each "
+            "page (html.parser) and be identical across backends.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=str(CORPUS_DIR),
+                            help="Directory of SERP pages (.html or .gz), matched to an engine by the engine "
+                                 "name appearing in their path. Defaults to the checked-in corpus; a "
+                                 "SERP_CACHE_DIR or fixture directory works too")
+        parser.add_argument("--backends", nargs="+", default=list(HtmlParser.BACKENDS),
+                            choices=HtmlParser.BACKENDS)
+        parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the pages per backend")
+        parser.add_argument("--update-golden", action="store_true",
+                            help="Write the current html.parser results as the golden output of every page")
+
+    def handle(self, *args, **options):
+        pages = self._load_pages(Path(options["dir"]))
+        if not pages:
+            raise CommandError(f"No SERP pages found under {options['dir']}")
+        self.stdout.write(f"{len(pages)} pages: " + ", ".join(
+            f"{sum(1 for _, strategy, _ in pages if strategy is s)} {s.name}" for s in STRATEGIES))
+
+        # html.parser is what the strategies were written against, so it's the reference output
+        backends = [HtmlParser.FALLBACK_BACKEND] + [b for b in options["backends"] if b != HtmlParser.FALLBACK_BACKEND]
+        expected = None
+        baseline_rate = None
+        for backend in backends:
+            if HtmlParser.backend_name(backend) != backend:
+                self.stderr.write(f"{backend}: not installed, skipping")
+                continue
+
+            with override_settings(SERP_PARSER_BACKEND=backend):
+                outputs = [strategy.parse_results(html) for _, strategy, html in pages]
+                timings = self._time_pages(pages, options["repeat"])
+                peaks = self._peak_memory(pages)
+
+            elapsed = sum(sum(samples) for samples in timings.values())
+            rate = len(pages) * options["repeat"] / elapsed
+            if expected is None:
+                expected, baseline_rate = outputs, rate
+            mismatches = [path for (path, _, _), got, want in zip(pages, outputs, expected) if got != want]
+            self.stdout.write(f"{backend:12} {rate:8.1f} pages/s  {rate / baseline_rate:5.2f}x  "
+                              f"{len(mismatches)} pages differ from {HtmlParser.FALLBACK_BACKEND}")
+            for strategy in STRATEGIES:
+                samples = timings.get(strategy.name)
+                if not samples:
+                    continue
+                self.stdout.write(f"  {strategy.name:12} {len(samples) / sum(samples):8.1f} pages/s  "
+                                  f"p50 {_percentile(samples, 0.5) * 1000:6.2f} ms  "
+                                  f"p99 {_percentile(samples, 0.99) * 1000:6.2f} ms  "
+                                  f"peak {peaks[strategy.name] / 1024 / 1024:6.2f} MB")
+            for path in mismatches:
+                self.stderr.write(f"  {backend} differs on {path}")
+
+        if expected is None:
+            return
+        if options["update_golden"]:
+            for (path, _, _), results in zip(pages, expected):
+                with open(self._golden_path(path), "w", encoding="utf-8") as f:
+                    json.dump(results, f, ensure_ascii=False, indent=1)
+                    f.write("\n")
+            self.stdout.write(f"Wrote golden output for {len(pages)} pages")
+            return
+        self._check_golden(pages, expected)
+
+    def _time_pages(self, pages: list, repeat: int) -> dict:
+        """Per-page parse seconds, grouped by engine name."""
+        timings = {}
+        for _ in range(repeat):
+            for _, strategy, html in pages:
+                started = time.perf_counter()
+                strategy.parse_results(html)
+                timings.setdefault(strategy.name, []).append(time.perf_counter() - started)
+        return timings
+
+    def _peak_memory(self, pages: list) -> dict:
+        """Largest traced allocation peak while parsing one page, per engine. Untimed, since
+        tracemalloc slows everything down."""
+        peaks = {}
+        tracemalloc.start()
+        try:
+            for _, strategy, html in pages:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                strategy.parse_results(html)
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                peaks[strategy.name] = max(peaks.get(strategy.name, 0), peak)
+        finally:
+            tracemalloc.stop()
+        return peaks
+
+    def _check_golden(self, pages: list, outputs: list):
+        missing, changed = [], []
+        for (path, _, _), results in zip(pages, outputs):
+            golden_path = self._golden_path(path)
+            if not golden_path.exists():
+                missing.append(path)
+                continue
+            with open(golden_path, encoding="utf-8") as f:
+                if json.load(f) != results:
+                    changed.append(path)
+        for path in changed:
+            self.stderr.write(f"  results changed for {path}")
+        if missing:
+            self.stdout.write(f"{len(missing)} pages have no golden output (add it with --update-golden)")
+        if changed:
+            raise CommandError(f"{len(changed)} pages no longer match their golden output; if the change is "
+                               f"intended, rerun with --update-golden and review the diff")
+        self.stdout.write(f"{len(pages) - len(missing)} pages match their golden output")
+
+    @staticmethod
+    def _golden_path(path: Path) -> Path:
+        return path.with_suffix(".json")
+
+    def _load_pages(self, directory: Path) -> list:
+        """(path, strategy, html) for every stored page under directory."""
+        pages = []
+        for path in sorted(directory.rglob("*")):
+            if path.suffix not in (".html", ".gz") or not path.is_file():
+                continue
+            parts = str(path.relative_to(directory)).lower()
+            strategy = next((s for s in STRATEGIES if s.name.lower() in parts), None)
+            if strategy is None:
+                continue
+            opener = gzip.open if path.suffix == ".gz" else open
+            with opener(path, "rt", encoding="utf-8") as f:
+                pages.append((path, strategy, f.read()))
+        return pages
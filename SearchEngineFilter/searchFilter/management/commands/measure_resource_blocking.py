@@ -0,0 +1,47 @@
+from statistics import mean
+
+from django.core.management.base import BaseCommand
+
+from searchFilter.DataScraper import RateLimiter, RequestHandler, Resilience
+
+
+class Command(BaseCommand):
+    help = ("Load each URL in headless Chrome with and without BROWSER_BLOCK_PROFILES and "
+            "report the bytes and milliseconds saved per page.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+")
+        parser.add_argument("--repeat", type=int, default=3, help="Loads per URL and mode")
+
+    def handle(self, *args, **options):
+        # Only the block profile differs between the two handlers; share everything else
+        rate_limiter = RateLimiter.HostRateLimiter.shared()
+        blocked = RequestHandler.RequestHandler(rate_limiter=rate_limiter)
+        unblocked = RequestHandler.RequestHandler(rate_limiter=rate_limiter, block_profiles={"default": []})
+
+        for url in options["urls"]:
+            runs = {"unblocked": [], "blocked": []}
+            for _ in range(options["repeat"]):
+                # Alternate so neither mode consistently gets the warmer cache
+                for name, handler in (("unblocked", unblocked), ("blocked", blocked)):
+                    try:
+                        handler.get(url)
+                    except Resilience.FetchError as e:
+                        self.stderr.write(f"{url} ({name}): {e}")
+                        continue
+                    runs[name].append(handler.page_stats.pop())
+
+            if not runs["unblocked"] or not runs["blocked"]:
+                self.stderr.write(f"{url}: page failed to load, skipping")
+                continue
+
+            before_ms = mean(s["ms"] for s in runs["unblocked"])
+            after_ms = mean(s["ms"] for s in runs["blocked"])
+            before_bytes = mean(s["bytes"] for s in runs["unblocked"])
+            after_bytes = mean(s["bytes"] for s in runs["blocked"])
+            self.stdout.write(
+                f"{url}\n"
+                f"  unblocked: {before_ms:8.0f} ms {before_bytes / 1024:10.1f} KB\n"
+                f"  blocked:   {after_ms:8.0f} ms {after_bytes / 1024:10.1f} KB\n"
+                f"  saved:     {before_ms - after_ms:8.0f} ms {(before_bytes - after_bytes) / 1024:10.1f} KB"
+            )
@@ -0,0 +1,122 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from searchFilter.DataInsertAndAccess.SearchQueryAdd import SearchQueryAdd
+from searchFilter.models import UrlData
+
+
+def _init_worker():
+    # Spawned workers (macOS, Windows) start without Django configured
+    django.setup()
+
+
+def _recount(row: tuple) -> tuple:
+    """(id, old count, new count) for one UrlData row."""
+    url_data_id, old_count, html, keyword = row
+    return url_data_id, old_count, SearchQueryAdd.get_count(html=html, keyword=keyword)
+
+
+class Command(BaseCommand):
+    help = ("Recompute UrlData.count_of_appearance for every stored page with the current counting rule, "
+            "on a process pool, writing back only the counts that changed. Rows are read in id order a "
+            "batch at a time and the last finished id is kept in a checkpoint file, so an interrupted "
+            "recount picks up where it stopped when run again.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--batch", type=int, default=500,
+                            help="Rows read, counted and written back at a time; bounds memory, since "
+                                 "a batch's pages are held at once")
+        parser.add_argument("--fetch-size", type=int, default=100,
+                            help="Rows fetched from the database cursor at a time")
+        parser.add_argument("--checkpoint", default="recount_appearances.checkpoint",
+                            help="File recording progress; removed once the recount finishes")
+        parser.add_argument("--restart", action="store_true",
+                            help="Ignore an existing checkpoint and recount from the first row")
+
+    def handle(self, *args, **options):
+        if options["batch"] < 1 or options["fetch_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--batch, --fetch-size and --workers must be at least 1")
+        checkpoint = options["checkpoint"]
+        state = {"last_id": 0, "processed": 0, "changed": 0}
+        if not options["restart"]:
+            state.update(self._read_checkpoint(checkpoint))
+        if state["last_id"]:
+            self.stdout.write(f"Resuming after id {state['last_id']} ({state['processed']} rows already "
+                              f"recounted, {state['changed']} changed)")
+
+        total = UrlData.objects.filter(id__gt=state["last_id"]).count()
+        if not total:
+            self.stdout.write("Nothing to recount")
+            self._remove_checkpoint(checkpoint)
+            return
+        self.stdout.write(f"Recounting {total} pages on {options['workers']} workers")
+
+        # Forked workers must not inherit the parent's database connections
+        connections.close_all()
+        started = time.monotonic()
+        processed = changed = 0
+        chunksize = max(1, options["batch"] // (options["workers"] * 4))
+        with multiprocessing.Pool(options["workers"], initializer=_init_worker) as pool:
+            while True:
+                # One keyset-paginated batch at a time: the cursor is drained before anything is
+                # written back, and the batch's pages are all that is held in memory
+                rows = (UrlData.objects.filter(id__gt=state["last_id"]).order_by("id")
+                        .values_list("id", "count_of_appearance", "html_data",
+                                     "searchUrls__searchTermId__searchTerm")[:options["batch"]])
+                updates, last_id, batch_rows = [], None, 0
+                for url_data_id, old_count, new_count in pool.imap(
+                        _recount, rows.iterator(chunk_size=options["fetch_size"]), chunksize=chunksize):
+                    batch_rows += 1
+                    last_id = url_data_id
+                    if new_count != old_count:
+                        updates.append(UrlData(id=url_data_id, count_of_appearance=new_count))
+                if last_id is None:
+                    break
+
+                UrlData.objects.bulk_update(updates, ["count_of_appearance"], batch_size=options["fetch_size"])
+                processed += batch_rows
+                changed += len(updates)
+                state = {"last_id": last_id, "processed": state["processed"] + batch_rows,
+                         "changed": state["changed"] + len(updates)}
+                self._write_checkpoint(checkpoint, state)
+
+                elapsed = time.monotonic() - started
+                rate = processed / elapsed
+                self.stdout.write(f"  {processed}/{total} pages, {changed} changed, {rate:.1f} pages/s, "
+                                  f"~{max(0, total - processed) / rate:.0f}s left")
+
+        self._remove_checkpoint(checkpoint)
+        self.stdout.write(f"Recounted {state['processed']} pages, {state['changed']} changed, "
+                          f"in {time.monotonic() - started:.1f}s")
+
+    def _read_checkpoint(self, path: str) -> dict:
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Can't read checkpoint {path}: {e}; fix it or pass --restart")
+        return {key: int(state.get(key, 0)) for key in ("last_id", "processed", "changed")}
+
+    @staticmethod
+    def _write_checkpoint(path: str, state: dict):
+        # Write to a temp file and rename so an interrupted write never leaves a partial checkpoint
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _remove_checkpoint(path: str):
+        if os.path.exists(path):
+            os.remove(path)
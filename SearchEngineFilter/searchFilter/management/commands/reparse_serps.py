@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import time
+from itertools import groupby
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from searchFilter.DataInsertAndAccess.SearchQueryAdd import SearchQueryAdd
+from searchFilter.DataScraper import SearchEngineStrategy, SearchUrl
+from searchFilter.DataScraper.SerpParser import PARSER_VERSION
+from searchFilter.models import SerpPage
+
+STRATEGIES = {strategy.name: strategy for strategy in (
+    SearchEngineStrategy.GoogleSearchStrategy(),
+    SearchEngineStrategy.BingSearchStrategy(),
+    SearchEngineStrategy.DuckDuckGoSearchStrategy(),
+    SearchEngineStrategy.YahooSearchStrategy(),
+)}
+
+
+def _init_worker():
+    # Spawned workers (macOS, Windows) start without Django configured
+    django.setup()
+
+
+def _reparse_run(task: tuple) -> tuple:
+    """(run id, results) for one archived run, pages merged in order like a live search.
+    results is None when the run's engine has no strategy any more."""
+    run_id, engine, pages = task
+    strategy = STRATEGIES.get(engine)
+    if strategy is None:
+        return run_id, None
+    results, seen_links = [], set()
+    for data in pages:
+        SearchUrl.merge_page(results, seen_links, strategy.parse_results(SerpPage.decompress(data)))
+    return run_id, results
+
+
+class Command(BaseCommand):
+    help = ("Re-parse archived SERP pages (SerpPage) with the current strategies on a process pool and "
+            "replace each run's SearchUrls rows with the results, tagged with the parser version. Scraped "
+            "landing pages follow their URL to the new rows. Runs already parsed at that version are "
+            "skipped, so an interrupted reparse can simply be restarted.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--parser-version", type=int, default=PARSER_VERSION,
+                            help="Version to tag the new rows with (defaults to SerpParser.PARSER_VERSION)")
+        parser.add_argument("--engine", default=None, help="Only re-parse this engine's runs, e.g. Google")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--chunk", type=int, default=100,
+                            help="Runs loaded from the database and handed to the pool at a time")
+
+    def handle(self, *args, **options):
+        version = options["parser_version"]
+        pending = SerpPage.objects.filter(parser_version__lt=version)
+        if options["engine"]:
+            pending = pending.filter(searchTermId__searchEngineName__name=options["engine"])
+        run_ids = list(pending.order_by("searchTermId_id").values_list("searchTermId_id", flat=True).distinct())
+        if not run_ids:
+            self.stdout.write(f"Every archived run is already parsed at version {version}")
+            return
+
+        self.stdout.write(f"Re-parsing {len(run_ids)} runs at version {version} on {options['workers']} workers")
+        # Forked workers must not inherit the parent's database connections
+        connections.close_all()
+        started = time.monotonic()
+        done = rows = skipped = busy = 0
+        with multiprocessing.Pool(options["workers"], initializer=_init_worker) as pool:
+            for start in range(0, len(run_ids), options["chunk"]):
+                tasks = self._load_runs(run_ids[start:start + options["chunk"]])
+                chunksize = max(1, len(tasks) // (options["workers"] * 4))
+                for run_id, results in pool.imap_unordered(_reparse_run, tasks, chunksize=chunksize):
+                    if results is None:
+                        skipped += 1
+                        self.stderr.write(f"  run {run_id}: no strategy for its engine, skipped")
+                        continue
+                    added = SearchQueryAdd.add_reparsed_results(run_id, results, version)
+                    if added is None:
+                        busy += 1
+                        continue
+                    rows += added
+                    done += 1
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"  {done + skipped + busy}/{len(run_ids)} runs, {rows} rows, "
+                                  f"{(done + skipped + busy) / elapsed:.1f} runs/s")
+
+        self.stdout.write(f"Re-parsed {done} runs into {rows} rows in {time.monotonic() - started:.1f}s"
+                          + (f", skipped {skipped}" if skipped else ""))
+        if busy:
+            self.stdout.write(f"{busy} runs had landing pages being scraped and were left pending; "
+                              f"run the command again once the scrape is done")
+
+    @staticmethod
+    def _load_runs(run_ids: list) -> list:
+        """(run id, engine name, [compressed page, ...]) per run, pages in order."""
+        pages = (SerpPage.objects.filter(searchTermId_id__in=run_ids)
+                 .order_by("searchTermId_id", "page")
+                 .values_list("searchTermId_id", "searchTermId__searchEngineName__name", "html"))
+        return [(run_id, engine, [bytes(html) for _, _, html in run_pages])
+                for (run_id, engine), run_pages in groupby(pages, key=lambda page: page[:2])]
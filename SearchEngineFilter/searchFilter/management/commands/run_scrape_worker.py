@@ -0,0 +1,86 @@
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from searchFilter.DataInsertAndAccess.JobQueue import JobQueue
+from searchFilter.DataScraper.DataScraper import DataScraper
+from searchFilter.models import ScrapeJob
+
+
+class Command(BaseCommand):
+    help = ("Run queued scrape jobs submitted through the submit_search_job and "
+            "submit_html_job endpoints. Start one process per unit of scraping capacity.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once the queue is empty instead of polling")
+
+    def handle(self, *args, **options):
+        worker = options["worker_id"]
+        self.stdout.write(f"Worker {worker} started")
+        while True:
+            job = JobQueue.claim_next(worker)
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Running job {job.id} ({job.kind}) {job.params}")
+            try:
+                with self.heartbeat(job):
+                    result = self.run_job(job)
+            except Exception as e:
+                traceback.print_exc()
+                self.finish(job, JobQueue.fail(job, f"Exception - {e}"))
+                continue
+
+            if result.get("success"):
+                self.finish(job, JobQueue.complete(job, result))
+            else:
+                self.finish(job, JobQueue.fail(job, result.get("error", "Unknown error")))
+
+    def finish(self, job: ScrapeJob, recorded: bool):
+        if recorded:
+            self.stdout.write(f"Finished job {job.id}: {job.status}")
+        else:
+            self.stderr.write(f"Job {job.id} was reclaimed by another worker, result dropped")
+
+    @contextmanager
+    def heartbeat(self, job: ScrapeJob):
+        """Renew the job's lease in the background while it runs, so other workers only
+        reclaim it once this process stops."""
+        stopped = threading.Event()
+
+        def renew():
+            try:
+                while not stopped.wait(JobQueue.lease_seconds() / 3):
+                    if not JobQueue.renew(job):
+                        self.stderr.write(f"Lost the lease on job {job.id}")
+                        return
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=renew, name=f"job-{job.id}-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def run_job(self, job: ScrapeJob) -> dict:
+        if job.kind == ScrapeJob.KIND_SEARCH:
+            return DataScraper.collect_urls(job.params["keyword"], job.params["url_size"])
+        if job.kind == ScrapeJob.KIND_HTML:
+            return DataScraper.collect_html_from_urls(keyword=job.params.get("keyword") or None)
+        raise ValueError(f"Unknown job kind '{job.kind}'")
@@ -0,0 +1,19 @@
+import os
+import socket
+
+from django.core.management.base import BaseCommand
+
+from searchFilter.DataScraper.DataScraper import DataScraper
+
+
+class Command(BaseCommand):
+    help = ("Scrape landing pages for unscraped SearchUrls rows. Rows are leased in batches, "
+            "so any number of these can run side by side across processes or machines.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keyword", default=None, help="Only scrape rows for this search term")
+        parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+
+    def handle(self, *args, **options):
+        result = DataScraper.collect_html_from_urls(keyword=options["keyword"], worker=options["worker_id"])
+        self.stdout.write(f"{options['worker_id']} scraped {len(result['urls'])} pages")
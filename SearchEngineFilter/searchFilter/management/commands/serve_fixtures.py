@@ -0,0 +1,81 @@
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from searchFilter.DataScraper.Fixtures import FixtureStore
+
+
+class Command(BaseCommand):
+    help = ("Serve recorded SERP and landing pages over HTTP with configurable latency and "
+            "error rate, for load testing the scrape pipeline without touching live engines. "
+            "Point SCRAPER_FIXTURE_SERVER at it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=getattr(settings, "SCRAPER_FIXTURE_DIR", None),
+                            help="Fixture directory (defaults to SCRAPER_FIXTURE_DIR)")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency-ms", type=float, default=0,
+                            help="Mean delay added to every response")
+        parser.add_argument("--jitter-ms", type=float, default=0,
+                            help="Uniform +/- spread around the mean delay")
+        parser.add_argument("--error-rate", type=float, default=0,
+                            help="Fraction of requests answered with a 503, between 0 and 1")
+
+    def handle(self, *args, **options):
+        if not options["dir"]:
+            raise CommandError("No fixture directory given and SCRAPER_FIXTURE_DIR is not set")
+        if not 0 <= options["error_rate"] <= 1:
+            raise CommandError("--error-rate must be between 0 and 1")
+
+        store = FixtureStore(options["dir"])
+        latency = options["latency_ms"] / 1000
+        jitter = options["jitter_ms"] / 1000
+        error_rate = options["error_rate"]
+
+        class FixtureHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                delay = max(0.0, latency + random.uniform(-jitter, jitter))
+                if delay:
+                    time.sleep(delay)
+
+                parsed = urlparse(self.path)
+                url = parse_qs(parsed.query).get("url", [None])[0]
+                if parsed.path != "/fetch" or not url:
+                    return self._reply(400, "expected /fetch?url=<page url>")
+                if random.random() < error_rate:
+                    return self._reply(503, "injected error")
+
+                html = store.load(url)
+                if html is None:
+                    return self._reply(404, f"no fixture for {url}")
+                self._reply(200, html, "text/html; charset=utf-8")
+
+            def _reply(self, status: int, body: str, content_type: str = "text/plain; charset=utf-8"):
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options["host"], options["port"]), FixtureHandler)
+        self.stdout.write(f"Serving fixtures from {store.directory} on "
+                          f"http://{options['host']}:{options['port']} "
+                          f"(latency {options['latency_ms']}ms +/- {options['jitter_ms']}ms, "
+                          f"error rate {error_rate})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.19 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('searchFilter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=15)),
+                ('params', models.JSONField(default=dict)),
+                ('status', models.CharField(db_index=True, default='queued', max_length=15)),
+                ('result', models.JSONField(null=True)),
+                ('error', models.TextField(null=True)),
+                ('worker', models.CharField(max_length=100, null=True)),
+                ('created_time', models.DateTimeField()),
+                ('started_time', models.DateTimeField(null=True)),
+                ('finished_time', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
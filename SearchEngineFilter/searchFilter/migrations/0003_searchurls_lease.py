@@ -0,0 +1,23 @@
+# Generated by Django 4.2.19 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('searchFilter', '0002_scrapejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchurls',
+            name='claimed_by',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchurls',
+            name='lease_expires',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.19 on 2026-10-18 12:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('searchFilter', '0003_searchurls_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchurls',
+            name='parser_version',
+            field=models.IntegerField(db_index=True, default=1),
+        ),
+        migrations.CreateModel(
+            name='SerpPage',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('page', models.IntegerField()),
+                ('html', models.BinaryField()),
+                ('parser_version', models.IntegerField(db_index=True)),
+                ('fetched_time', models.DateTimeField()),
+                ('searchTermId', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='searchFilter.searchtermmapping')),
+            ],
+            options={
+                'unique_together': {('searchTermId', 'page')},
+            },
+        ),
+    ]
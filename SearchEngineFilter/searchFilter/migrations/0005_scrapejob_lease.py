@@ -0,0 +1,23 @@
+# Generated by Django 4.2.19 on 2026-10-18 12:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('searchFilter', '0004_serppage_parser_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapejob',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='scrapejob',
+            name='lease_expires',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
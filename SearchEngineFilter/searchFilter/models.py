@@ -1,3 +1,4 @@
+import zlib
 from tkinter.constants import CASCADE
 
 from django.db import models
@@ -21,9 +22,60 @@ class SearchUrls(models.Model):
     ad_promo = models.BooleanField()
     data_scrape_time = models.DateTimeField(null=True)
     searchTermId = models.ForeignKey(SearchTermMapping, on_delete=models.CASCADE)
+    # Set while a worker is scraping the row; an expired lease means that worker died
+    claimed_by = models.CharField(max_length=100, null=True)
+    lease_expires = models.DateTimeField(null=True)
+    # SerpParser.PARSER_VERSION that produced the row; reparse_serps replaces a run's rows
+    # with rows at a newer version
+    parser_version = models.IntegerField(default=1, db_index=True)
+
+class SerpPage(models.Model):
+    """Raw HTML of one results page a run used, zlib-compressed, so the run can be parsed
+    again when selectors change. A run is one engine's SearchTermMapping."""
+    id = models.AutoField(primary_key=True)
+    searchTermId = models.ForeignKey(SearchTermMapping, on_delete=models.CASCADE)
+    page = models.IntegerField()
+    html = models.BinaryField()
+    # Newest parser version whose rows were stored for this page's run
+    parser_version = models.IntegerField(db_index=True)
+    fetched_time = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("searchTermId", "page")
+
+    @staticmethod
+    def compress(html: str) -> bytes:
+        return zlib.compress(html.encode("utf-8"), 6)
+
+    @staticmethod
+    def decompress(data: bytes) -> str:
+        return zlib.decompress(data).decode("utf-8")
 
 class UrlData(models.Model):
     id = models.AutoField(primary_key=True)
     searchUrls = models.ForeignKey(SearchUrls, on_delete=models.CASCADE)
     count_of_appearance = models.BigIntegerField()
     html_data = models.TextField()
+
+class ScrapeJob(models.Model):
+    KIND_SEARCH = "search"
+    KIND_HTML = "html"
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=15)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=15, default=STATUS_QUEUED, db_index=True)
+    result = models.JSONField(null=True)
+    error = models.TextField(null=True)
+    worker = models.CharField(max_length=100, null=True)
+    # Renewed by the running worker's heartbeat; an expired lease means that worker died
+    lease_expires = models.DateTimeField(null=True)
+    attempts = models.IntegerField(default=0)
+    created_time = models.DateTimeField()
+    started_time = models.DateTimeField(null=True)
+    finished_time = models.DateTimeField(null=True)
@@ -1,3 +1,792 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import requests
+from bs4 import BeautifulSoup
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from selenium.common.exceptions import WebDriverException
+
+from searchFilter.DataInsertAndAccess.JobQueue import JobQueue
+from searchFilter.DataInsertAndAccess.SearchQueryAdd import SearchQueryAdd
+from searchFilter.DataScraper import (
+    DriverPool, HttpSessions, KeywordCounter, ProxyPool, RateLimiter, RenderMode, RequestHandler, Resilience,
+    SearchEngineStrategy, SearchUrl
+)
+from searchFilter.DataScraper.AdClassifier import AdClassifier, AdMatch, Rule
+from searchFilter.DataScraper.DataScraper import DataScraper
+from searchFilter.DataScraper.ScrapePipeline import ScrapePipeline
+from searchFilter.DataScraper.SerpCache import SerpCache
+from searchFilter.DataScraper.SerpParser import SelectorIndex
+from searchFilter.models import ScrapeJob, SearchEngine, SearchTermMapping, SearchUrls, SerpPage, UrlData
+
+
+class FakeLandingPages:
+    """get_with_fallback stand-in that records how many fetches overlap, overall and per host."""
+
+    def __init__(self, fail_hosts=()):
+        self.fail_hosts = set(fail_hosts)
+        self.in_flight = {}
+        self.peak_per_host = {}
+        self.peak_total = 0
+        self.lock = threading.Lock()
+
+    def get_with_fallback(self, url: str) -> str:
+        host = url.split("/")[2]
+        with self.lock:
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.peak_per_host[host] = max(self.peak_per_host.get(host, 0), self.in_flight[host])
+            self.peak_total = max(self.peak_total, sum(self.in_flight.values()))
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight[host] -= 1
+        if host in self.fail_hosts:
+            raise ValueError(f"{host} is down")
+        return f"<html><body><p>{'landing page text ' * 20}{url}</p></body></html>"
+
+
+class ScrapePipelineTests(SimpleTestCase):
+
+    def rows(self, hosts: dict) -> list:
+        return [SearchUrls(url=f"https://{host}/{i}") for host, count in hosts.items() for i in range(count)]
+
+    def test_respects_the_global_and_per_host_caps(self):
+        pages = FakeLandingPages()
+        rows = self.rows({"a.com": 6, "b.com": 6, "c.com": 1})
+        results = list(ScrapePipeline(pages, max_workers=4, per_host=2).run(rows))
+        self.assertEqual(sorted(row.url for row, _, _ in results), sorted(row.url for row in rows))
+        self.assertEqual(max(pages.peak_per_host.values()), 2)
+        self.assertLessEqual(pages.peak_total, 4)
+        # Both busy hosts run side by side rather than one after the other
+        self.assertEqual(pages.peak_total, 4)
+
+    def test_errors_are_yielded_per_row(self):
+        pages = FakeLandingPages(fail_hosts={"down.com"})
+        results = {row.url: (html, error) for row, html, error in
+                   ScrapePipeline(pages, max_workers=2, per_host=1).run(self.rows({"down.com": 2, "up.com": 2}))}
+        self.assertTrue(all(html is None and isinstance(error, ValueError)
+                            for url, (html, error) in results.items() if "down.com" in url))
+        self.assertTrue(all(error is None and url in html
+                            for url, (html, error) in results.items() if "up.com" in url))
+
+
+class HostRateLimiterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.slept = []
+        for target, replacement in (("monotonic", lambda: self.now), ("sleep", self.slept.append)):
+            patcher = mock.patch.object(RateLimiter.time, target, side_effect=replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.limiter = RateLimiter.HostRateLimiter(limits={"google.com": {"rate": 0.5, "burst": 1}},
+                                                   default={"rate": 2.0, "burst": 2}, jitter=0)
+
+    def test_burst_is_free_then_requests_are_spaced_at_the_rate(self):
+        waits = [self.limiter.wait("https://example.com/page") for _ in range(4)]
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 1.0])
+        self.assertEqual(self.slept, [0.5, 1.0])
+
+    def test_tokens_refill_over_time(self):
+        for _ in range(2):
+            self.limiter.wait("https://example.com/page")
+        self.now += 1.0
+        self.assertEqual([self.limiter.wait("https://example.com/page") for _ in range(3)], [0.0, 0.0, 0.5])
+
+    def test_hosts_have_separate_buckets_and_engines_their_own_limits(self):
+        self.limiter.wait("https://www.google.com/search?q=a")
+        self.assertEqual(self.limiter.wait("https://www.google.com/search?q=b"), 2.0)
+        self.assertEqual(self.limiter.wait("https://example.com/"), 0.0)
+        self.assertEqual(self.limiter.wait("https://other.example.com/"), 0.0)
+
+
+class DnsCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(HttpSessions.time, "monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(HttpSessions.socket, "getaddrinfo",
+                                    side_effect=lambda host, port, *args: [(2, 1, 6, "", (f"10.0.0.{len(host)}", port))])
+        self.getaddrinfo = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lookups_are_cached_until_they_expire(self):
+        cache = HttpSessions.DnsCache(ttl=300)
+        self.assertEqual(cache.resolve("a.com", 443), ["10.0.0.5"])
+        cache.resolve("a.com", 443)
+        self.assertEqual(self.getaddrinfo.call_count, 1)
+        self.now += 300
+        cache.resolve("a.com", 443)
+        self.assertEqual(self.getaddrinfo.call_count, 2)
+
+    def test_least_recently_used_and_expired_hosts_are_dropped(self):
+        cache = HttpSessions.DnsCache(ttl=300, max_entries=2)
+        cache.resolve("a.com", 443)
+        cache.resolve("b.com", 443)
+        cache.resolve("a.com", 443)
+        cache.resolve("c.com", 443)
+        self.assertEqual(list(cache._entries), [("a.com", 443), ("c.com", 443)])
+        self.now += 300
+        cache.resolve("d.com", 443)
+        self.assertEqual(list(cache._entries), [("d.com", 443)])
+
+
+class ConnectionStatsTests(SimpleTestCase):
+
+    @staticmethod
+    def _use_pool(manager, url: str, num_requests: int, num_connections: int):
+        pool = manager.connection_from_url(url)
+        pool.num_requests += num_requests
+        pool.num_connections += num_connections
+
+    def test_direct_and_proxied_pools_are_counted_until_and_after_eviction(self):
+        adapter = HttpSessions.CountingHTTPAdapter(pool_connections=1)
+        self._use_pool(adapter.poolmanager, "https://a.com/", num_requests=4, num_connections=1)
+        proxied = adapter.proxy_manager_for("http://proxy:3128")
+        self.assertIs(adapter.proxy_manager_for("http://proxy:3128"), proxied)
+        self._use_pool(proxied, "https://b.com/", num_requests=6, num_connections=2)
+        self.assertEqual(adapter.connection_stats()["requests"], 10)
+
+        # pool_connections=1: each manager evicts its older pool for the new host
+        self._use_pool(adapter.poolmanager, "https://c.com/", num_requests=2, num_connections=1)
+        self._use_pool(proxied, "https://d.com/", num_requests=4, num_connections=1)
+        self.assertEqual(adapter.connection_stats(), {"requests": 16, "connections": 5, "reuse_ratio": 1 - 5 / 16})
+
+        adapter.close()
+        self.assertEqual(adapter.connection_stats()["requests"], 16)
+
+
+class FakeResponse:
+
+    def __init__(self, body: bytes, content_type: str = "text/html", encoding: str = None, chunk_size: int = 4):
+        self.headers = {"Content-Type": content_type}
+        self.encoding = encoding
+        self.body = body
+        self.chunk_size = chunk_size
+        self.chunks_read = 0
+
+    def iter_content(self, chunk_size: int):
+        for start in range(0, len(self.body), self.chunk_size):
+            self.chunks_read += 1
+            yield self.body[start:start + self.chunk_size]
+
+
+class ReadHtmlTests(SimpleTestCase):
+
+    def setUp(self):
+        self.handler = RequestHandler.RequestHandler(driver_pool=DriverPool.DriverPool(size=1))
+
+    @override_settings(MAX_PAGE_BYTES=10)
+    def test_body_is_cut_at_the_byte_cap(self):
+        response = FakeResponse(b"<p>" + b"x" * 100 + b"</p>")
+        self.assertEqual(self.handler._read_html(response, "https://example.com"), "<p>xxxxxxx")
+        self.assertEqual(response.chunks_read, 3)
+
+    def test_charset_comes_from_the_header_then_the_meta_tag(self):
+        text = "<html><head><meta charset=\"windows-1251\"></head><body>привет</body></html>"
+        body = text.encode("windows-1251")
+        self.assertEqual(self.handler._read_html(FakeResponse(body, chunk_size=64), "https://example.com"), text)
+        utf8 = FakeResponse(text.encode("utf-8"), "text/html; charset=utf-8", encoding="utf-8", chunk_size=64)
+        self.assertEqual(self.handler._read_html(utf8, "https://example.com"), text)
+
+    def test_multibyte_characters_split_across_chunks_decode(self):
+        text = "<p>café ünïcødé</p>"
+        response = FakeResponse(text.encode("utf-8"), chunk_size=3)
+        self.assertEqual(self.handler._read_html(response, "https://example.com"), text)
+
+    def test_non_html_is_rejected_before_reading(self):
+        response = FakeResponse(b"%PDF-1.7", "application/pdf")
+        with self.assertRaises(RequestHandler.ContentRejected):
+            self.handler._read_html(response, "https://example.com/file.pdf")
+        self.assertEqual(response.chunks_read, 0)
+
+
+
+class FakeRenderer:
+    """RequestHandler stand-in: plain HTTP raises or returns http, the browser returns rendered."""
+
+    def __init__(self, http, rendered: str = None):
+        self.http = http
+        self.rendered = rendered
+        self.rendered_urls = []
+
+    def get_with_fallback(self, url: str) -> str:
+        if isinstance(self.http, Exception):
+            raise self.http
+        return self.http
+
+    def get(self, url: str, regions=()) -> str:
+        self.rendered_urls.append(url)
+        return self.rendered
+
+
+class AdaptiveFetcherTests(SimpleTestCase):
+    PAGE = f"<html><body><p>{'landing page text ' * 20}</p></body></html>"
+
+    def fetch(self, handler: FakeRenderer) -> tuple:
+        selector = RenderMode.RenderModeSelector({})
+        html = RenderMode.AdaptiveFetcher(handler, selector).fetch_page("https://example.com/page")
+        return html, selector.mode_for("example.com")
+
+    def test_static_page_stays_on_plain_http(self):
+        handler = FakeRenderer(self.PAGE)
+        self.assertEqual(self.fetch(handler), (self.PAGE, RenderMode.HTTP))
+        self.assertEqual(handler.rendered_urls, [])
+
+    def test_js_shell_escalates_to_the_browser(self):
+        handler = FakeRenderer("<div id='app'></div>", rendered=self.PAGE)
+        self.assertEqual(self.fetch(handler), (self.PAGE, RenderMode.BROWSER))
+
+    def test_refused_plain_http_escalates_to_the_browser(self):
+        for error in (Resilience.BlockedError("Blocked by example.com"), Resilience.FetchError("429 Too Many Requests"),
+                      Resilience.CircuitOpenError("Circuit open for example.com (http)")):
+            with self.subTest(error=error):
+                handler = FakeRenderer(error, rendered=self.PAGE)
+                self.assertEqual(self.fetch(handler), (self.PAGE, RenderMode.BROWSER))
+
+    def test_dead_links_and_non_html_are_not_rendered(self):
+        for error in (Resilience.FetchError("404 Not Found", retryable=False),
+                      RequestHandler.ContentRejected("Skipping https://example.com/page: content type image/png")):
+            with self.subTest(error=error):
+                handler = FakeRenderer(error, rendered=self.PAGE)
+                with self.assertRaises(Resilience.FetchError):
+                    self.fetch(handler)
+                self.assertEqual(handler.rendered_urls, [])
+
+    def test_forbidden_is_a_block(self):
+        response = mock.MagicMock()
+        response.__enter__.return_value = response
+        response.raise_for_status.side_effect = requests.HTTPError("403 Client Error",
+                                                                   response=mock.Mock(status_code=403))
+        session = mock.Mock(get=mock.Mock(return_value=response))
+        handler = RequestHandler.RequestHandler(driver_pool=DriverPool.DriverPool(size=1), session=session,
+                                                circuit_breaker=Resilience.CircuitBreaker(),
+                                                proxy_pool=ProxyPool.ProxyPool([]))
+        with self.assertRaises(Resilience.BlockedError):
+            handler.get_with_fallback("https://example.com/page")
+
+class SearchUrlLeaseTests(TestCase):
+
+    def setUp(self):
+        engine = SearchEngine.objects.create(name="Google", baseUrl="https://www.google.com")
+        run = SearchTermMapping.objects.create(searchEngineName=engine, searchTerm="red fox",
+                                               time_searched=timezone.now())
+        self.rows = [SearchUrls.objects.create(url=f"https://example.com/{i}", desc="", title=str(i),
+                                               ad_promo=False, searchTermId=run) for i in range(6)]
+        SearchUrls.objects.create(url="https://ads.example.com", desc="", title="ad", ad_promo=True,
+                                  searchTermId=run)
+
+    def test_claimers_get_disjoint_batches_and_skip_ads(self):
+        _, first = DataScraper.claim_search_urls("a", batch_size=4, keyword="red fox")
+        _, second = DataScraper.claim_search_urls("b", batch_size=4, keyword="red fox")
+        self.assertEqual([row.id for row in first], [row.id for row in self.rows[:4]])
+        self.assertEqual([row.id for row in second], [row.id for row in self.rows[4:]])
+        _, third = DataScraper.claim_search_urls("c", batch_size=4, keyword="red fox")
+        self.assertEqual(third, [])
+
+    def test_claimer_with_stale_candidates_does_not_take_leased_rows(self):
+        _, first = DataScraper.claim_search_urls("a", batch_size=3, keyword="red fox")
+        real_candidates = DataScraper.get_list_of_search_urls
+        # "b" read its candidates before "a" wrote its lease, so it sees a's rows first
+        stale = [first]
+        with mock.patch.object(DataScraper, "get_list_of_search_urls",
+                               side_effect=lambda **kwargs: stale.pop() if stale else real_candidates(**kwargs)):
+            _, second = DataScraper.claim_search_urls("b", batch_size=3, keyword="red fox")
+        self.assertEqual([row.id for row in second], [row.id for row in self.rows[3:]])
+
+    def test_expired_lease_is_reclaimed(self):
+        _, first = DataScraper.claim_search_urls("a", batch_size=6, keyword="red fox")
+        self.assertEqual(len(first), 6)
+        SearchUrls.objects.filter(id=first[0].id).update(lease_expires=timezone.now() - timedelta(seconds=1))
+        _, second = DataScraper.claim_search_urls("b", batch_size=6, keyword="red fox")
+        self.assertEqual([row.id for row in second], [first[0].id])
+
+    def test_release_keeps_the_lease_on_unscraped_rows(self):
+        claim_id, rows = DataScraper.claim_search_urls("a", batch_size=2, keyword="red fox")
+        SearchUrls.objects.filter(id=rows[0].id).update(data_scrape_time=timezone.now())
+        DataScraper.release_search_urls(claim_id)
+        self.assertIsNone(SearchUrls.objects.get(id=rows[0].id).claimed_by)
+        self.assertEqual(SearchUrls.objects.get(id=rows[1].id).claimed_by, claim_id)
+
+
+class ProxyPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(ProxyPool.time, "monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = ProxyPool.ProxyPool(["http://p1:3128", "http://p2:3128"], quarantine_after=2,
+                                        quarantine_seconds=60)
+
+    def test_sessions_stick_to_their_proxy_and_spread_over_the_pool(self):
+        first = self.pool.assign("run:google")
+        second = self.pool.assign("run:bing")
+        self.assertIsNot(first, second)
+        self.assertIs(self.pool.assign("run:google"), first)
+        self.assertIs(self.pool.assign("run:bing"), second)
+
+    def test_failing_proxy_is_quarantined_and_its_sessions_move(self):
+        proxy = self.pool.assign("run:google")
+        self.pool.record_failure(proxy, "run:google")
+        self.pool.record_failure(proxy, "run:google")
+        other = self.pool.assign("run:google")
+        self.assertIsNot(other, proxy)
+        self.assertIs(self.pool.assign("run:bing"), other)
+        self.assertTrue(self.pool.stats()[self.pool.proxies.index(proxy)]["quarantined"])
+
+        self.pool.record_failure(other, "run:google")
+        self.pool.record_failure(other, "run:google")
+        with self.assertRaises(Resilience.FetchError):
+            self.pool.assign("run:google")
+
+        self.now += 60
+        self.assertIn(self.pool.assign("run:google"), self.pool.proxies)
+
+    def test_success_resets_the_failure_streak(self):
+        proxy = self.pool.assign("run:google")
+        self.pool.record_failure(proxy)
+        self.pool.record_success(proxy, latency_ms=100)
+        self.pool.record_failure(proxy)
+        self.assertFalse(proxy.is_quarantined(self.now))
+        self.assertEqual((proxy.requests, proxy.failures), (3, 2))
+
+    def test_empty_pool_connects_directly(self):
+        self.assertIsNone(ProxyPool.ProxyPool([]).assign("run:google"))
+
+
+class PageUrlTests(SimpleTestCase):
+
+    def test_page_urls_match_the_original_offsets(self):
+        expected = {
+            SearchEngineStrategy.GoogleSearchStrategy: ["&start=0", "&start=10", "&start=20"],
+            SearchEngineStrategy.BingSearchStrategy: ["&first=1", "&first=11", "&first=21"],
+            SearchEngineStrategy.DuckDuckGoSearchStrategy: ["", "&s=30", "&s=60"],
+            SearchEngineStrategy.YahooSearchStrategy: ["&first=1", "&first=11", "&first=21"],
+        }
+        for strategy_class, suffixes in expected.items():
+            strategy = strategy_class()
+            base = strategy.build_search_url("red fox")
+            self.assertEqual([strategy.page_url("red fox", page) for page in range(3)],
+                             [base + suffix for suffix in suffixes])
+
+    def test_pages_for(self):
+        google = SearchEngineStrategy.GoogleSearchStrategy()
+        self.assertEqual(google.pages_for(0), 1)
+        self.assertEqual(google.pages_for(10), 1)
+        self.assertEqual(google.pages_for(25), 3)
+        self.assertEqual(google.pages_for(10_000), google.max_pages)
+        self.assertEqual(SearchEngineStrategy.DuckDuckGoSearchStrategy().pages_for(45), 2)
+
+
+class FakeFetcher:
+    """fetch_serp stand-in serving canned results by page number."""
+
+    def __init__(self, strategy, pages):
+        self.urls = [strategy.page_url("red fox", page) for page in range(strategy.max_pages)]
+        self.pages = pages
+        self.fetched = []
+
+    def fetch_serp(self, url, parse, regions=()):
+        page = self.urls.index(url)
+        self.fetched.append(page)
+        results = self.pages[page]
+        if isinstance(results, Exception):
+            raise results
+        return f"<html>page {page}</html>", results
+
+
+def _organic(*ids):
+    return [{"link": f"https://example.com/{i}", "title": str(i), "ad_promo": False} for i in ids]
+
+
+@override_settings(SERP_MIN_NEW_RATIO=0.2)
+class PaginationTests(SimpleTestCase):
+
+    def search(self, pages, total_results):
+        strategy = SearchEngineStrategy.GoogleSearchStrategy()
+        fetcher = FakeFetcher(strategy, pages)
+        search = SearchUrl.SearchUrls(strategy, request_handle=None, cache=SerpCache(mode="off"), fetcher=fetcher,
+                                      prefetch_depth=1)
+        return search, search.get_search_results("red fox", total_results), fetcher
+
+    def test_stops_once_the_budget_is_met(self):
+        search, results, fetcher = self.search([_organic(*range(10)), _organic(*range(10, 20)),
+                                                _organic(*range(20, 30))], total_results=15)
+        self.assertEqual(len(results), 20)
+        self.assertEqual(fetcher.fetched, [0, 1])
+        self.assertEqual(search.stats["stop_reason"], "budget_met")
+
+    def test_replans_from_the_observed_yield(self):
+        pages = [_organic(*range(page * 5, page * 5 + 5)) for page in range(10)]
+        search, results, fetcher = self.search(pages, total_results=20)
+        self.assertEqual(fetcher.fetched, [0, 1, 2, 3])
+        self.assertEqual(len(results), 20)
+        self.assertEqual(search.stats["pages_planned"], 4)
+
+    def test_stops_on_an_empty_page(self):
+        search, _, fetcher = self.search([_organic(*range(10)), [], _organic(*range(10, 20))], total_results=30)
+        self.assertEqual(fetcher.fetched, [0, 1])
+        self.assertEqual(search.stats["stop_reason"], "empty_page")
+
+    def test_stops_when_a_page_repeats_itself(self):
+        search, _, fetcher = self.search([_organic(*range(10)), _organic(*range(1, 11)), _organic(*range(20, 30))],
+                                         total_results=30)
+        self.assertEqual(fetcher.fetched, [0, 1])
+        self.assertEqual(search.stats["stop_reason"], "low_yield")
+
+    def test_keeps_earlier_pages_when_a_fetch_fails(self):
+        search, results, _ = self.search([_organic(*range(10)), Resilience.FetchError("timeout")],
+                                         total_results=30)
+        self.assertEqual(len(results), 10)
+        self.assertEqual(search.stats["stop_reason"], "fetch_failed")
+
+
+class AdClassifierTests(SimpleTestCase):
+
+    def setUp(self):
+        self.classifier = AdClassifier([
+            Rule("aclk", "url", ("/aclk?", "googleadservices")),
+            Rule("label", "text", ("sponsored ", "ad ")),
+            Rule("price", "html", ("mKZH5e",), lowercase=False),
+            Rule("marker", "html", ("data-text-ad",)),
+            Rule("empty", "text", ()),
+        ])
+
+    def test_the_matching_rule_and_indicator_are_reported(self):
+        self.assertEqual(self.classifier.classify(url="https://www.googleadservices.com/x"),
+                         AdMatch("aclk", "googleadservices"))
+        self.assertEqual(self.classifier.classify(text="Sponsored Shoes"), AdMatch("label", "sponsored "))
+        self.assertEqual(self.classifier.classify(html='<div data-text-ad="1">'), AdMatch("marker", "data-text-ad"))
+
+    def test_lowercase_only_applies_to_rules_that_ask_for_it(self):
+        self.assertEqual(self.classifier.classify(html='<span class="mKZH5e">'), AdMatch("price", "mKZH5e"))
+        self.assertIsNone(self.classifier.classify(html='<span class="mkzh5e">'))
+        self.assertEqual(self.classifier.classify(html='<div DATA-TEXT-AD>'), AdMatch("marker", "data-text-ad"))
+
+    def test_fields_are_scanned_in_declaration_order(self):
+        match = self.classifier.classify(url="https://x.com/aclk?sa=1", text="Ad - result", html="data-text-ad")
+        self.assertEqual(match.rule, "aclk")
+
+    def test_organic_results_and_missing_fields_do_not_match(self):
+        self.assertIsNone(self.classifier.classify(url="https://example.com", text="Red fox facts", html="<div>"))
+        self.assertIsNone(self.classifier.classify(url=None, text=""))
+
+
+SELECTOR_PAGE = """
+<div id="rso">
+  <div class="g"><div class="yuRUbf"><a href="/1"><h3>One</h3></a></div><div class="VwiC3b">first</div></div>
+  <div class="g MjjYud" data-hveid="x"><a href="/2" data-jsarwt="1"><h3>Two</h3></a>
+    <div class="g"><span>nested</span></div></div>
+  <li class="b_ad"><a>ad</a></li>
+  <div aria-label="Ads"><a class="sVXRqc" href="/ad">Ad</a></div>
+</div>
+<div id="tads"><a href="/top">Top ad</a><div data-text-ad="1">text ad</div></div>
+<ul id="b_results"><li class="b_algo">r1</li><li class="b_ad">r2</li><li>r3</li></ul>
+"""
+
+
+class SelectorIndexTests(SimpleTestCase):
+
+    def test_collect_matches_select_for_every_selector(self):
+        selectors = [
+            "div.g, div.ULSxyf, div.MjjYud",
+            "#rso .yuRUbf",
+            'div[aria-label="Ads"] a.sVXRqc',
+            'a[data-jsarwt="1"]',
+            "[data-text-ad]",
+            "#tads a",
+            "#b_results > li",
+            "li.b_ad",
+            "#b_results li:not(.b_ad)",
+            "h3",
+        ]
+        soup = BeautifulSoup(SELECTOR_PAGE, "html.parser")
+        collected = SelectorIndex(selectors).collect(soup)
+        for selector in selectors:
+            with self.subTest(selector=selector):
+                self.assertEqual(collected[selector], soup.select(selector))
+                self.assertTrue(collected[selector])
+
+    def test_duplicate_selectors_share_one_entry(self):
+        index = SelectorIndex(["h3", "h3", "a"])
+        self.assertEqual(index.selectors, ["h3", "a"])
+
+
+class KeywordCounterTests(SimpleTestCase):
+
+    def test_counts_whole_words_case_insensitively(self):
+        self.assertEqual(KeywordCounter.count_keyword("<p>Fox, fox! foxes firefox FOX</p>", "fox"), 3)
+
+    def test_ignores_markup_the_reader_never_sees(self):
+        html = ("<head><title>fox</title><style>.fox {}</style><script>var fox = 1;</script></head>"
+                "<body><!-- fox --><a href='/fox' title='fox'>a fox</a><noscript>fox</noscript></body>")
+        self.assertEqual(KeywordCounter.count_keyword(html, "fox"), 2)
+
+    def test_phrases_match_across_whitespace_entities_and_tags(self):
+        html = "<p>red\n  fox</p><p>red&nbsp;fox</p><p>red</p><p>fox</p><p>redfox</p>"
+        self.assertEqual(KeywordCounter.count_keyword(html, "red fox"), 3)
+
+    def test_entities_are_decoded(self):
+        self.assertEqual(KeywordCounter.count_keyword("<p>fish &amp; chips</p>", "fish & chips"), 1)
+
+    def test_overlapping_keywords_count_the_longer_match(self):
+        counter = KeywordCounter.KeywordCounter(["fox", "red fox", "Fox"])
+        self.assertEqual(counter.keywords, ("fox", "red fox", "Fox"))
+        self.assertEqual(counter.count("<p>red fox and a fox</p>"), {"fox": 1, "red fox": 1, "Fox": 0})
+
+    def test_blank_keywords_count_zero(self):
+        self.assertEqual(KeywordCounter.count_keyword("<p>fox</p>", ""), 0)
+        self.assertEqual(KeywordCounter.count_keyword("<p>fox</p>", "   "), 0)
+        self.assertEqual(KeywordCounter.count_keyword("", "fox"), 0)
+
+
+class RecountAppearancesTests(TransactionTestCase):
+    # Not TestCase: the pool reads rows on its own thread, which would block on the test transaction
+
+    def setUp(self):
+        engine = SearchEngine.objects.create(name="Google", baseUrl="https://www.google.com")
+        run = SearchTermMapping.objects.create(searchEngineName=engine, searchTerm="fox", time_searched=timezone.now())
+        row = SearchUrls.objects.create(url="https://example.com", desc="", title="", ad_promo=False,
+                                        searchTermId=run)
+        # Stored under an older counting rule: the attribute and the substring in "firefox" were counted
+        self.pages = [UrlData.objects.create(searchUrls=row, count_of_appearance=stale, html_data=html)
+                      for stale, html in ((3, "<p title='fox'>fox firefox</p>"), (2, "<p>fox fox</p>"),
+                                          (5, "<p>a fox</p>"))]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, "recount.checkpoint")
+
+    def _recount(self, **options) -> str:
+        out = StringIO()
+        call_command("recount_appearances", workers=1, batch=2, checkpoint=self.checkpoint, stdout=out, **options)
+        return out.getvalue()
+
+    def _counts(self) -> list:
+        return [UrlData.objects.get(id=page.id).count_of_appearance for page in self.pages]
+
+    def test_counts_are_corrected_and_the_checkpoint_removed(self):
+        output = self._recount()
+        self.assertEqual(self._counts(), [1, 2, 1])
+        self.assertIn("Recounted 3 pages, 2 changed", output)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resumes_after_the_checkpointed_id(self):
+        with open(self.checkpoint, "w", encoding="utf-8") as f:
+            json.dump({"last_id": self.pages[1].id, "processed": 2, "changed": 1}, f)
+        output = self._recount()
+        self.assertEqual(self._counts(), [3, 2, 1])
+        self.assertIn("Recounted 3 pages, 2 changed", output)
+
+    def test_restart_ignores_the_checkpoint(self):
+        with open(self.checkpoint, "w", encoding="utf-8") as f:
+            json.dump({"last_id": self.pages[-1].id}, f)
+        self._recount(restart=True)
+        self.assertEqual(self._counts(), [1, 2, 1])
+
+
+class JobQueueTests(TestCase):
+
+    def expire(self, job: ScrapeJob):
+        ScrapeJob.objects.filter(id=job.id).update(lease_expires=timezone.now() - timedelta(seconds=1))
+
+    def test_job_is_claimed_once(self):
+        JobQueue.submit(ScrapeJob.KIND_SEARCH, {"keyword": "red fox"})
+        job = JobQueue.claim_next("a")
+        self.assertEqual((job.status, job.worker, job.attempts), (ScrapeJob.STATUS_RUNNING, "a", 1))
+        self.assertIsNone(JobQueue.claim_next("b"))
+
+    def test_job_of_a_dead_worker_is_reclaimed(self):
+        JobQueue.submit(ScrapeJob.KIND_SEARCH, {"keyword": "red fox"})
+        stalled = JobQueue.claim_next("a")
+        self.expire(stalled)
+        job = JobQueue.claim_next("b")
+        self.assertEqual((job.id, job.worker, job.attempts), (stalled.id, "b", 2))
+        # The stalled worker can neither renew nor overwrite the new run's outcome
+        self.assertFalse(JobQueue.renew(stalled))
+        self.assertFalse(JobQueue.complete(stalled, {"success": True}))
+        self.assertTrue(JobQueue.complete(job, {"success": True}))
+        self.assertEqual(JobQueue.get(job.id).status, ScrapeJob.STATUS_DONE)
+
+    @override_settings(SCRAPE_JOB_MAX_ATTEMPTS=2)
+    def test_job_is_failed_once_its_attempts_are_spent(self):
+        JobQueue.submit(ScrapeJob.KIND_SEARCH, {"keyword": "red fox"})
+        for worker in ("a", "b"):
+            self.expire(JobQueue.claim_next(worker))
+        self.assertIsNone(JobQueue.claim_next("c"))
+        self.assertEqual(JobQueue.get(1).status, ScrapeJob.STATUS_FAILED)
+
+
+def _failing(error: Resilience.FetchError):
+    def fetch():
+        raise error
+    return fetch
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.breaker = Resilience.CircuitBreaker(failure_threshold=3, reset_seconds=60)
+        self.policy = Resilience.RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001)
+        self.now = 1000.0
+        patcher = mock.patch.object(Resilience.time, "monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self, fetch):
+        try:
+            return self.policy.call(fetch, self.breaker, "example.com")
+        except Resilience.FetchError as e:
+            return e
+
+    def test_failed_call_counts_once_however_many_attempts(self):
+        attempts = []
+
+        def fetch():
+            attempts.append(1)
+            raise Resilience.FetchError("timeout")
+
+        self.call(fetch)
+        self.call(fetch)
+        self.assertEqual(len(attempts), 6)
+        self.assertEqual(self.breaker.state("example.com"), Resilience.CircuitBreaker.CLOSED)
+        self.call(fetch)
+        self.assertEqual(self.breaker.state("example.com"), Resilience.CircuitBreaker.OPEN)
+
+    def test_open_circuit_fails_fast(self):
+        for _ in range(3):
+            self.call(_failing(Resilience.FetchError("timeout")))
+        fetch = mock.Mock(return_value="html")
+        self.assertIsInstance(self.call(fetch), Resilience.CircuitOpenError)
+        fetch.assert_not_called()
+
+    def test_errors_that_are_not_the_hosts_fault_do_not_open_it(self):
+        for _ in range(5):
+            self.call(_failing(Resilience.FetchError("404", retryable=False)))
+        self.assertEqual(self.breaker.state("example.com"), Resilience.CircuitBreaker.CLOSED)
+
+    def test_blocked_is_a_host_failure(self):
+        for _ in range(3):
+            self.call(_failing(Resilience.BlockedError("captcha")))
+        self.assertEqual(self.breaker.state("example.com"), Resilience.CircuitBreaker.OPEN)
+
+    def test_half_open_trial_closes_or_reopens(self):
+        for _ in range(3):
+            self.call(_failing(Resilience.FetchError("timeout")))
+        self.now += 60
+        self.call(_failing(Resilience.FetchError("timeout")))
+        self.assertEqual(self.breaker.state("example.com"), Resilience.CircuitBreaker.OPEN)
+
+        self.now += 60
+        outcomes = iter([Resilience.FetchError("timeout"), "html"])
+
+        def flaky():
+            outcome = next(outcomes)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        # The trial call's own retries go through even though the circuit is half open
+        self.assertEqual(self.call(flaky), "html")
+        self.assertEqual(self.breaker.state("example.com"), Resilience.CircuitBreaker.CLOSED)
+
+    def test_only_one_trial_while_half_open(self):
+        for _ in range(3):
+            self.call(_failing(Resilience.FetchError("timeout")))
+        self.now += 60
+        self.breaker.before_call("example.com")
+        with self.assertRaises(Resilience.CircuitOpenError):
+            self.breaker.before_call("example.com")
+        # A trial that never reported back is replaced
+        self.now += 60
+        self.breaker.before_call("example.com")
+
+    def test_errors_before_the_host_is_contacted_are_not_reported(self):
+        for _ in range(2):
+            self.call(_failing(Resilience.FetchError("timeout")))
+        self.call(_failing(Resilience.BrowserUnavailable("No browser available after 120s")))
+        with self.assertRaises(ValueError):
+            self.call(_failing(ValueError("bug in the fetch")))
+        # Neither reset the two failures before them
+        self.call(_failing(Resilience.FetchError("timeout")))
+        self.assertEqual(self.breaker.state("example.com"), Resilience.CircuitBreaker.OPEN)
+
+        self.now += 60
+        self.call(_failing(Resilience.BrowserUnavailable("DriverPool is closed")))
+        self.assertEqual(self.breaker.state("example.com"), Resilience.CircuitBreaker.HALF_OPEN)
+
+    def test_rejected_content_means_the_host_answered(self):
+        for _ in range(2):
+            self.call(_failing(Resilience.FetchError("timeout")))
+        self.call(_failing(RequestHandler.ContentRejected("Skipping https://example.com: content type image/png")))
+        self.call(_failing(Resilience.FetchError("timeout")))
+        self.assertEqual(self.breaker.state("example.com"), Resilience.CircuitBreaker.CLOSED)
+
+
+class DriverPoolTests(SimpleTestCase):
+
+    def test_pool_failures_are_fetch_errors_that_spare_the_host(self):
+        pool = DriverPool.DriverPool(size=1, acquire_timeout=0.01)
+        with mock.patch.object(pool, "_launch", side_effect=WebDriverException("chrome not reachable")):
+            with self.assertRaises(Resilience.BrowserUnavailable) as launch:
+                pool._acquire()
+        self.assertTrue(launch.exception.retryable)
+        self.assertFalse(launch.exception.reached_host)
+
+        with mock.patch.object(pool, "_launch", return_value=mock.Mock()):
+            pool._acquire()
+            with self.assertRaises(Resilience.BrowserUnavailable) as exhausted:
+                pool._acquire()
+        self.assertFalse(exhausted.exception.retryable)
+
+        pool._closed = True
+        with self.assertRaises(Resilience.BrowserUnavailable):
+            pool._acquire()
+
+
+class ReparseTests(TestCase):
+
+    def setUp(self):
+        engine = SearchEngine.objects.create(name="Google", baseUrl="https://www.google.com")
+        self.run = SearchTermMapping.objects.create(searchEngineName=engine, searchTerm="red fox",
+                                                    time_searched=timezone.now())
+        self.scraped_at = timezone.now() - timedelta(days=1)
+        self.kept = SearchUrls.objects.create(url="https://example.com/kept", desc="", title="kept", ad_promo=False,
+                                              data_scrape_time=self.scraped_at, searchTermId=self.run)
+        self.dropped = SearchUrls.objects.create(url="https://example.com/dropped", desc="", title="dropped",
+                                                 ad_promo=False, searchTermId=self.run)
+        self.page_data = UrlData.objects.create(searchUrls=self.kept, count_of_appearance=2, html_data="<p>fox</p>")
+        SerpPage.objects.create(searchTermId=self.run, page=0, html=SerpPage.compress("<html></html>"),
+                                parser_version=1, fetched_time=timezone.now())
+
+    @staticmethod
+    def _result(link: str) -> dict:
+        return {"link": link, "description": "", "title": link.rsplit("/", 1)[-1], "ad_promo": False}
+
+    def test_reparse_replaces_the_runs_rows(self):
+        results = [self._result("https://example.com/kept"), self._result("https://example.com/new")]
+        self.assertEqual(SearchQueryAdd.add_reparsed_results(self.run.id, results, parser_version=2), 2)
+
+        rows = SearchUrls.objects.filter(searchTermId=self.run).order_by("id")
+        self.assertEqual([(row.url, row.parser_version) for row in rows],
+                         [("https://example.com/kept", 2), ("https://example.com/new", 2)])
+        self.assertEqual(rows[0].data_scrape_time, self.scraped_at)
+        self.assertIsNone(rows[1].data_scrape_time)
+        self.assertEqual(UrlData.objects.get(id=self.page_data.id).searchUrls_id, rows[0].id)
+        self.assertEqual(SerpPage.objects.get(searchTermId=self.run).parser_version, 2)
+
+    def test_run_with_a_live_lease_is_left_alone(self):
+        SearchUrls.objects.filter(id=self.dropped.id).update(claimed_by="worker",
+                                                             lease_expires=timezone.now() + timedelta(minutes=5))
+        self.assertIsNone(SearchQueryAdd.add_reparsed_results(self.run.id, [], parser_version=2))
+        self.assertEqual(SearchUrls.objects.filter(searchTermId=self.run, parser_version=1).count(), 2)
+        self.assertEqual(SerpPage.objects.get(searchTermId=self.run).parser_version, 1)
@@ -6,5 +6,9 @@ urlpatterns = [
     path('get_html_data', views.get_html_data, name = "get_html_data"),
     path('get_list_of_links_for_keyword', views.get_list_of_links_for_keyword, name = "get_list_of_links_for_keyword"),
     path('get_list_of_ads_none_ads', views.get_list_of_ads_none_ads, name = "get_list_of_ads_none_ads"),
-    path('get_list_of_dups', views.get_list_of_dups, name = "get_list_of_dups")
+    path('get_list_of_dups', views.get_list_of_dups, name = "get_list_of_dups"),
+    path('submit_search_job', views.submit_search_job, name = "submit_search_job"),
+    path('submit_html_job', views.submit_html_job, name = "submit_html_job"),
+    path('get_job_status', views.get_job_status, name = "get_job_status"),
+    path('get_job_result', views.get_job_result, name = "get_job_result")
 ]
\ No newline at end of file
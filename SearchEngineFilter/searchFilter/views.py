@@ -1,11 +1,20 @@
+import logging
+
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 
 from .DataInsertAndAccess.GetSQLData import GetSQLData
+from .DataInsertAndAccess.JobQueue import JobQueue
 from .DataScraper import DataScraper
+from .models import ScrapeJob
+
+logger = logging.getLogger(__name__)
 
 
 # Create your views here.
+# index and get_html_data scrape inside the request and hold it open until they finish. The
+# frontend submits jobs instead (submit_search_job / submit_html_job, then get_job_status and
+# get_job_result); these blocking views stay for scripts and manual runs without a worker.
 def index(request):
     keyword = request.GET.get("keyword", "")
     if not keyword:
@@ -43,11 +52,12 @@ def get_list_of_links_for_keyword(request):
     try:
         list_of_links = GetSQLData.get_list_of_links_for_keyword(keyword=keyword)
 
-        # Debug: Print ad_promo values
-        ad_count = sum(1 for link in list_of_links if link.get('ad_promo'))
-        print(f"Found {len(list_of_links)} links, {ad_count} ads/promos")
-        for link in list_of_links[:5]:  # Print the first 5 for debugging
-            print(f"Link: {link.get('title')} - ad_promo: {link.get('ad_promo')}")
+        # Debug: Log ad_promo values
+        if logger.isEnabledFor(logging.DEBUG):
+            ad_count = sum(1 for link in list_of_links if link.get('ad_promo'))
+            logger.debug("Found %d links, %d ads/promos", len(list_of_links), ad_count)
+            for link in list_of_links[:5]:  # Log the first 5 for debugging
+                logger.debug("Link: %s - ad_promo: %s", link.get('title'), link.get('ad_promo'))
 
         return JsonResponse({
             "success": True,
@@ -96,4 +106,78 @@ def get_list_of_dups(request):
         return JsonResponse({
             "success": False,
             "error": f"Exception - {e}"
-        })
\ No newline at end of file
+        })
+
+
+def submit_search_job(request):
+    keyword = request.GET.get("keyword", "")
+    if not keyword:
+        return JsonResponse({
+            "success": False,
+            "error": "No keyword provided"
+        })
+    url_size_param = request.GET.get("url_size", "")
+    try:
+        url_size = int(url_size_param) if url_size_param else 10
+    except ValueError:
+        return JsonResponse({
+            "success": False,
+            "error": " Invalid size provided"
+        })
+
+    job = JobQueue.submit(ScrapeJob.KIND_SEARCH, {"keyword": keyword, "url_size": url_size})
+    return JsonResponse({
+        "success": True,
+        "job_id": job.id
+    })
+
+
+def submit_html_job(request):
+    keyword = request.GET.get("keyword", "")
+    job = JobQueue.submit(ScrapeJob.KIND_HTML, {"keyword": keyword})
+    return JsonResponse({
+        "success": True,
+        "job_id": job.id
+    })
+
+
+def get_job_status(request):
+    job = _get_job(request)
+    if job is None:
+        return JsonResponse({
+            "success": False,
+            "error": "Unknown job_id"
+        })
+    return JsonResponse({
+        "success": True,
+        "job": JobQueue.to_dict(job)
+    })
+
+
+def get_job_result(request):
+    job = _get_job(request)
+    if job is None:
+        return JsonResponse({
+            "success": False,
+            "error": "Unknown job_id"
+        })
+    if job.status == ScrapeJob.STATUS_FAILED:
+        return JsonResponse({
+            "success": False,
+            "status": job.status,
+            "error": job.error
+        })
+    if job.status != ScrapeJob.STATUS_DONE:
+        return JsonResponse({
+            "success": False,
+            "status": job.status,
+            "error": "Job has not finished"
+        })
+    return JsonResponse(job.result)
+
+
+def _get_job(request):
+    try:
+        return JobQueue.get(int(request.GET.get("job_id", "")))
+    except ValueError:
+        return None
@@ -0,0 +1,36 @@
+import api from './api'
+
+const POLL_INTERVAL_MS = 2000
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms))
+
+// Queue a scrape job with one of the submit_*_job endpoints, poll its status until a
+// worker (manage.py run_scrape_worker) finishes it, and resolve with its result payload,
+// the same JSON the old blocking views returned
+export const runJob = async (submitPath: string, params: Record<string, unknown> = {}) => {
+    const submitted = await api.get(submitPath, { params })
+    if (!submitted.data.success) {
+        throw new Error(submitted.data.error)
+    }
+    const jobId = submitted.data.job_id
+
+    for (;;) {
+        await sleep(POLL_INTERVAL_MS)
+        const status = await api.get('searchFilter/get_job_status', { params: { job_id: jobId } })
+        if (!status.data.success) {
+            throw new Error(status.data.error)
+        }
+        if (status.data.job.status === 'failed') {
+            throw new Error(status.data.job.error)
+        }
+        if (status.data.job.status === 'done') {
+            break
+        }
+    }
+
+    const result = await api.get('searchFilter/get_job_result', { params: { job_id: jobId } })
+    if (!result.data.success) {
+        throw new Error(result.data.error)
+    }
+    return result.data
+}
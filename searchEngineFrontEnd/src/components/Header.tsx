@@ -1,7 +1,7 @@
 import { Button, ButtonGroup } from "@mui/material";
 import React, { useState } from "react";
 import { useNavigate } from "react-router-dom";
-import api from "../api/api";
+import { runJob } from "../api/jobs";
 
 const Header = () => {
 	const [active, setActive] = useState("getUrls");
@@ -12,9 +12,9 @@ const Header = () => {
 	const onClickUpdateScrape = async () => {
 		try {
 			setLoadingButton(true);
-			const response = await api.get("searchFilter/get_html_data");
-			const flatUrls = response.data.urls.flat();
-			console.log("our response", response, flatUrls);
+			const result = await runJob("searchFilter/submit_html_job");
+			const flatUrls = result.urls.flat();
+			console.log("our response", result, flatUrls);
 			setResponse(flatUrls);
 			setLoadingButton(false);
 		} catch (error) {
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from "react";
 import { Button, Grid, TextField, Box, Stack } from "@mui/material";
-import api from "../api/api";
+import { runJob } from "../api/jobs";
 import TablePopulation from "./organization/TablePopulation";
 
 const ScrapeUrls = () => {
@@ -21,14 +21,12 @@ const ScrapeUrls = () => {
 	const handleOnClick = async () => {
 		try {
 			setLoading(true);
-			const response = await api.get("searchFilter/", {
-				params: {
-					keyword: searchVal,
-					url_size: urlSize,
-				},
+			const result = await runJob("searchFilter/submit_search_job", {
+				keyword: searchVal,
+				url_size: urlSize,
 			});
-			const flatUrls = response.data.urls.flat();
-			console.log(response.data.flatUrls);
+			const flatUrls = result.urls.flat();
+			console.log(flatUrls);
 			setListOfUrls(flatUrls);
 			setLoading(false);
 		} catch (error) {